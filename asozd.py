@@ -2,17 +2,19 @@
 Definition of ASOZDParser class.
 Provides parser logic for docx files.
 """
+import errno
+import hashlib
 import io
 import json
 import logging
-import operator
 import os
 import re
-import shutil
+import time
 
 
+from compiled_config import get_compiled_config, search_text_re
 from docx.document import DOCXDocument
-from docx.items import DOCXDrawing, DOCXParagraph
+from docx.metrics import NULL_PARAGRAPH_COSTS
 
 
 logger = logging.getLogger(__name__)
@@ -23,9 +25,150 @@ BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 IN_DIR = r'in'
 OUT_DIR = r'out'
 IMAGES_OUT_DIR = r'images'
+# content addressed storage of deduplicated images (within IMAGES_OUT_DIR)
+IMAGES_STORE_DIR = r'.store'
+# errors of os.link() meaning that images can't be deduplicated
+# (file system doesn't support hard links or the link count limit
+# is reached), images are kept as copies then
+HARD_LINK_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EMLINK
+}
 
 DEBUG = True
 
+# version of parsing logic, has to be increased on every change
+# which affects parsing results
+PARSER_VERSION = '1'
+
+
+def dump_results_json(results, filepath):
+    """Writes results to the destination json file."""
+    with io.open(filepath, 'w', encoding='utf8') as json_file:
+        json.dump(
+            results,
+            json_file,
+            ensure_ascii=False,
+            indent=3
+        )
+
+
+def normalize_items(items,
+                    strip=False,
+                    collapse_whitespace=False,
+                    remove_empty=False,
+                    dedupe=False):
+    """
+    Returns list of strings normalized in one batch.
+
+    Steps are applied in order: stripping, collapsing of whitespace
+    sequences into single space, removing of empty (whitespace only)
+    items and removing of repeated items (first occurrence is kept).
+    """
+    if collapse_whitespace:
+        items = [' '.join(x.split()) for x in items]
+    elif strip:
+        items = [x.strip() for x in items]
+    if remove_empty:
+        # the same as `x.split()` check without building lists
+        items = [x for x in items if x and not x.isspace()]
+    if dedupe:
+        items = list(dict.fromkeys(items))
+    return list(items)
+
+
+def remove_image_file(filename):
+    """
+    Removes previously saved image file.
+
+    Image could be a hard link to the deduplicated content, so it has
+    to be unlinked instead of being overwritten in place.
+    """
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def dedup_image_file(filename, results_dir=None):
+    """
+    Replaces image file with hard link to the same content stored
+    in content addressed storage, so identical images of different
+    documents occupy disk space once.
+
+    Returns path of the image within the storage.
+    """
+    out_dir = results_dir if results_dir else os.path.join(BASE_DIR, OUT_DIR)
+    store_dir = os.path.join(out_dir, IMAGES_OUT_DIR, IMAGES_STORE_DIR)
+    os.makedirs(store_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    store_filename = os.path.join(
+        store_dir,
+        digest.hexdigest() + os.path.splitext(filename)[1]
+    )
+
+    try:
+        try:
+            os.link(filename, store_filename)
+        except FileExistsError:
+            # stored already, maybe by another worker process just now
+            if not os.path.samefile(filename, store_filename):
+                tmp_filename = filename + '.tmp'
+                remove_image_file(tmp_filename)
+                os.link(store_filename, tmp_filename)
+                os.replace(tmp_filename, filename)
+    except OSError as e:
+        if e.errno not in HARD_LINK_UNSUPPORTED_ERRNOS:
+            raise
+        # file system doesn't support hard links, keeping the copy
+        logger.warning("Couldn't deduplicate image %s", filename,
+                       exc_info=True)
+    return store_filename
+
+
+def save_exported_results(exported, results_dir=None, dedup_images=False):
+    """
+    Saving results returned by ASOZDParser.export_results().
+
+    Doesn't need opened docx document, so could be run in another
+    thread or process than parsing. Returns list of saved file names.
+    """
+    out_dir = results_dir if results_dir else os.path.join(BASE_DIR, OUT_DIR)
+    os.makedirs(os.path.join(out_dir, IMAGES_OUT_DIR), exist_ok=True)
+
+    filepath = os.path.join(out_dir, exported['json_file_name'])
+    logger.debug('save_exported_results.filename {}'.format(filepath))
+    dump_results_json(exported['results'], filepath)
+    saved = [filepath]
+
+    for image_file_name, image_data in exported['images']:
+        filename = os.path.join(out_dir, image_file_name)
+        remove_image_file(filename)
+        with open(filename, 'wb') as fimg:
+            fimg.write(image_data)
+        if dedup_images:
+            dedup_image_file(filename, out_dir)
+        saved.append(filename)
+
+    return saved
+
+
+def parse_docx_data(source, **kwargs):
+    """
+    Parses docx document without touching disk.
+
+    `source` is a docx file name, its content (bytes, bytearray or
+    memoryview) or a binary file-like object. Keyword arguments are
+    passed to ASOZDParser. Returns dict of ASOZDParser.export_results()
+    with results and images content.
+    """
+    with ASOZDParser(source, **kwargs) as P:
+        P.load_paragraphs()
+        return P.export_results()
+
 
 class ASOZDParser(DOCXDocument):
     """Class for retreiving data from formed docx documents"""
@@ -45,8 +188,9 @@ class ASOZDParser(DOCXDocument):
         if kwargs.get('linesep'):
             self._line_separator = kwargs.get('linesep')
 
-        # file name for docx document
-        self.file_name = file_name
+        # opt-in per paragraph profiling (docx.metrics.ParagraphCosts)
+        self._paragraph_costs = kwargs.get('paragraph_costs') or \
+            NULL_PARAGRAPH_COSTS
 
         # configuration
         from parser_config import config
@@ -57,8 +201,6 @@ class ASOZDParser(DOCXDocument):
 
         self._init_config()
 
-        self._doc = DOCXDocument(self.file_name)
-
     def is_debug(self):
         """
         Returns True is debug mode is switched on.
@@ -72,40 +214,37 @@ class ASOZDParser(DOCXDocument):
         return self._line_separator
 
     def get_doc(self):
-        """Returns reference to Document"""
-        return self._doc
+        """
+        Returns reference to Document.
+
+        Parser is the document itself, so the docx archive
+        is opened only once per parse.
+        """
+        return self
 
     def _init_config(self):
-        dct = {}
-        for item in self.config['types'].items():
-            if item[1].get('check_re'):
-                dct[item[1]['check_re']] = item[0]
-        self._re_list = dct
-
-        dct = {}
-        for item in self.config['types'].items():
-            if item[1].get('check_re'):
-                dct[item[1]['order_id']] = item[0]
-        zero_get = operator.itemgetter(0)
-        self._config_ordered = \
-            [self.config['types'][x[1]]
-             for x in sorted(dct.items(), key=zero_get)]
-        # self._dbg('Ordered config created:')
-        # pprint(self._config_ordered)
-
-        # dct = {}
-        # for item in self.config['types'].items():
-        #     dct[item[0]] = {
-        #         'text': None,
-        #         'raw_text': []
-        #     }
-        # self._results = dct
-        self._results = {item[0]: {'text': None, 'raw_text': []}
-                         for item in self.config['types'].items()}
+        # config is compiled once and shared by all instances
+        self._compiled_config = get_compiled_config(self.config)
+
+        self._results = {res_type: {'text': None, 'raw_text': []}
+                         for res_type in self._compiled_config.types}
+        # text fragments joined on demand (see _join_results_text)
+        self._text_parts = {res_type: []
+                            for res_type in self._compiled_config.types}
+
+        self._classifier = self._compiled_config.classifier
+
+    def get_paragraph_costs(self):
+        """Returns per paragraph costs collector"""
+        return self._paragraph_costs
 
     def get_config(self, res_type, key):
-        """Returns config 'key' value for specified 'type'"""
-        return self.config['types'][res_type].get(key)
+        """
+        Returns compiled config 'key' value for specified 'type'.
+
+        Regular expressions are returned compiled.
+        """
+        return getattr(self._compiled_config.types[res_type], key, None)
 
     def add_result(self,
                    res_type,
@@ -115,8 +254,8 @@ class ASOZDParser(DOCXDocument):
         """Adds recognition result to internal storage"""
 
         replacement = replace_check_re_with
-        config_dont_replace = \
-            self.get_config(res_type, 'do_not_replace_check_re')
+        type_config = self._compiled_config.types[res_type]
+        config_dont_replace = type_config.do_not_replace_check_re
 
         text_to_save = text
 
@@ -128,34 +267,32 @@ class ASOZDParser(DOCXDocument):
 
         if not(replacement is None) and not config_dont_replace:
             # replace find pattern string in plain text
-            text_to_save = re.sub(
-                self.get_config(res_type, 'check_re'),
+            text_to_save = type_config.check_re.sub(
                 replacement,
                 text_to_save
             )
 
             # replace find pattern string in raw text list
             if raw_text_to_save:
-                if re.sub(self.get_config(res_type, 'check_re'),
-                          replacement,
-                          raw_text_to_save[0]) == '':
+                if type_config.check_re.sub(replacement,
+                                            raw_text_to_save[0]) == '':
                     logger.debug(
                         ('Raw-text-to-save element '
                          f'removed {raw_text_to_save[0]}')
                     )
                     raw_text_to_save.pop(0)
 
-        # adding plain text to internal storage
-        self._results[res_type]['text'] = (
-            self._results[res_type]['text']
-            if self._results[res_type]['text']
-            else ''
-            ) + text_to_save
+        # adding plain text to internal storage, fragments are
+        # accumulated in amortized O(1) and joined on demand
+        self._text_parts[res_type].append(text_to_save)
+        self._results[res_type]['raw_text'].extend(raw_text_to_save)
 
-        self._results[res_type]['raw_text'] = (
-            self._results[res_type]['raw_text']
-            if self._results[res_type]['raw_text']
-            else []) + raw_text_to_save
+    def _join_results_text(self):
+        """Joins accumulated text fragments into results 'text' values"""
+        for res_type, parts in self._text_parts.items():
+            if len(parts) > 1:
+                parts[:] = [''.join(parts)]
+            self._results[res_type]['text'] = parts[0] if parts else None
 
     def add_result_image(self, res_type, image_name):
         """Adding image data to specific result domain"""
@@ -168,11 +305,28 @@ class ASOZDParser(DOCXDocument):
             self._results[res_type]['images'] = [image_name]
 
     def get_fio(self):
-        """Returns 'fio' text value for the instance"""
-        return self._results['fio']['text'].strip()
+        """
+        Returns 'fio' text value for the instance.
 
-    def save_result_images(self, results_dir=None):
-        """Copying images from docx zip structure to the destination folder"""
+        Raises ValueError if 'fio' wasn't recognized, results
+        can't be named without it.
+        """
+        fio = ''.join(self._text_parts['fio']).strip()
+        if not fio:
+            raise ValueError(
+                "'fio' isn't recognized in {}".format(self.get_display_name())
+            )
+        return fio
+
+    def save_result_images(self, results_dir=None, dedup_images=False):
+        """
+        Copying images from docx zip structure to the destination folder.
+
+        Identical images are stored once and hard linked to the
+        destination if `dedup_images` is True (see dedup_image_file).
+        Returns list of saved images file names.
+        """
+        saved = []
         if self._results['photo'].get('images'):
             for img_name in self._results['photo']['images']:
                 logger.info('Trying to save image: {}'.format(img_name))
@@ -181,16 +335,22 @@ class ASOZDParser(DOCXDocument):
                     img_name, results_dir
                 )
                 if filename:
+                    started = time.perf_counter()
+                    remove_image_file(filename)
                     with open(filename, 'wb') as fimg:
-                        try:
-                            docx_img = None
-                            doc = self.get_doc()
-                            docx_img = doc.open_docx_image(img_name)
-                            shutil.copyfileobj(docx_img, fimg)
-                        finally:
-                            if docx_img:
-                                docx_img.close()
+                        nbytes = self.get_doc().copy_docx_image(
+                            img_name, fimg
+                        )
+                    if dedup_images:
+                        dedup_image_file(filename, results_dir)
+                    self.get_metrics().add(
+                        'save_result_images',
+                        time.perf_counter() - started,
+                        nbytes
+                    )
+                    saved.append(filename)
                 logger.info('Image saved.')
+        return saved
 
     def gen_fname_for_result_json(
             self,
@@ -253,55 +413,89 @@ class ASOZDParser(DOCXDocument):
         `list_of_strings`: True for the domain or if the config
         has a setting "'is_image': True" for the domain.
         """
+        self._join_results_text()
+
         res = {}
-        for item in self.config['types'].items():
-            if self.config['types'][item[0]].get('list_of_strings') is True:
-                remove_empty_items = self.config['types'][item[0]]\
-                    .get('remove_empty_items')
-
-                if remove_empty_items is True:
-                    res[item[0]] = [
-                        y for y in self._results[item[0]]['raw_text']
-                        if y.split()
-                    ]
-                else:
-                    res[item[0]] = [
-                        y for y in self._results[item[0]]['raw_text']
-                    ]
+        for res_type, type_config in self._compiled_config.types.items():
+            if type_config.list_of_strings:
+                res[res_type] = normalize_items(
+                    self._results[res_type]['raw_text'],
+                    strip=type_config.strip_items,
+                    collapse_whitespace=type_config.collapse_whitespace,
+                    remove_empty=type_config.remove_empty_items,
+                    dedupe=type_config.dedupe_items
+                )
 
-            elif self.config['types'][item[0]].get('is_image') is True:
-                if self._results[item[0]].get('images'):
-                    res[item[0]] = [
+            elif type_config.is_image:
+                if self._results[res_type].get('images'):
+                    res[res_type] = [
                         self.gen_fname_for_result_image(img_name)
-                        for img_name in self._results[item[0]]['images']
+                        for img_name in self._results[res_type]['images']
                     ]
             else:
-                res[item[0]] = self._results[item[0]]['text']
+                res[res_type] = self._results[res_type]['text']
         return res
 
     def save_results_json(self, results_dir=None, results_file_name=None):
-        """Saving text results of paragraph to the destination file."""
+        """
+        Saving text results of paragraph to the destination file.
+
+        Returns the destination file name.
+        """
         filepath = self.gen_fname_for_result_json(
             results_dir,
             results_file_name
         )
         logger.debug('save_results_json.filename {}'.format(filepath))
 
-        with io.open(filepath, 'w', encoding='utf8') as json_file:
-            json.dump(
-                self.get_results_for_save(),
-                json_file,
-                ensure_ascii=False,
-                indent=3
+        started = time.perf_counter()
+        dump_results_json(self.get_results_for_save(), filepath)
+        if self.get_metrics().is_enabled():
+            self.get_metrics().add(
+                'save_results_json',
+                time.perf_counter() - started,
+                os.path.getsize(filepath)
             )
+        return filepath
+
+    def get_result_images_data(self):
+        """
+        Returns list of (destination file name, content) pairs
+        for images of the results.
+        """
+        res = []
+        for img_name in self._results['photo'].get('images') or []:
+            filename = self.gen_fname_for_result_image(img_name)
+            if filename:
+                with self.get_doc().open_docx_image(img_name) as docx_img:
+                    res.append((filename, docx_img.read()))
+        return res
+
+    def export_results(self, results_file_name=None):
+        """
+        Returns parsing results as plain dict.
+
+        Dict contains destination json file name, results for save and
+        images content, so it could be passed to another process and
+        saved there with save_exported_results().
+        """
+        filepath = self.gen_fname_for_result_json(
+            results_file_name=results_file_name
+        )
+        return {
+            'json_file_name': os.path.basename(filepath),
+            'results': self.get_results_for_save(),
+            'images': self.get_result_images_data(),
+        }
 
     def get_internal_results(self):
         """Returns internal results of recognition"""
+        self._join_results_text()
         return self._results
 
     def get_ordered_config(self):
-        """Return ordered config"""
-        return self._config_ordered
+        """Return compiled types with `check_re` in `order_id` order"""
+        return self._compiled_config.ordered
 
     def get_config_str(self):
         """Return config as json"""
@@ -311,59 +505,59 @@ class ASOZDParser(DOCXDocument):
         """
         Run process of recognition of paragraph.
 
-        Looping over internal config and applying `check_re`
-        regular expressions to determine type of the
+        Applying compiled `check_re` regular expressions
+        from internal config to determine type of the
         paragraph content.
         """
-        logger.debug(
-            'Paragraph text ({}): {}'.format(
-                para._item.tag, para.getCleanedText()
-            )
-        )
-        for regexp in self._re_list.items():
-            tmp_re = re.compile(regexp[0])
-            logger.debug(
-                'Trying to recognize paragraph '
-                '[{}] as {} with regex {}'.format(
-                    para.getId(), regexp[1], regexp[0]
-                )
-            )
-            # self._dbg('Paragraph text: %s' % para.getCleanedText().strip())
-            if tmp_re.match(para.getCleanedText().strip()):
-
-                not_re = self.config['types'][regexp[1]].get('not_re')
-                if not_re:
-                    tmp_not_re = re.compile(not_re)
-                    if not tmp_not_re.match(para.getCleanedText().strip()):
-                        logger.debug(
-                            'Paragraph text: {}'.format(para.getCleanedText())
-                        )
-                        return regexp[1]
-                    else:
-                        pass
-                else:
-                    return regexp[1]
+        text = para.getCleanedText().strip()
+        logger.debug('Paragraph text (%s): %s', para.getId(), text)
+
+        with self.get_metrics().timer('recognize_paragraph', len(text)), \
+                self._paragraph_costs.timer(para, 'classify'):
+            return self._classifier.classify(text)
 
-        return None
+    def is_section_full(self, res_type, size):
+        """
+        Returns True if section of `res_type` has got `max_paragraphs`
+        paragraphs (if the limit is configured for the type).
+        """
+        max_paragraphs = self._compiled_config.types[res_type].max_paragraphs
+        return max_paragraphs is not None and size >= max_paragraphs
 
     def load_paragraphs(self):
         """
         Load docx paragraphs (one by one) to
         instance with recognition all of them.
+
+        Reading of the document is stopped as soon as a section with
+        `stop_parsing_when_closed` config setting is closed by the next
+        recognized section or by its `max_paragraphs` limit.
         """
         # open file
-        document = self._doc
+        document = self.get_doc()
 
         # load data from file
         document.load()
 
+        records = document.get_doc_paragraph_records_iter()
+        try:
+            self._load_paragraph_records(records)
+        finally:
+            # releases the rest of document if parsing was stopped
+            records.close()
+
+    def _load_paragraph_records(self, records):
+        document = self.get_doc()
+        types = self._compiled_config.types
+
         # iterate over document paragraphs
         par_iter = 1
         last_recognized_type = None
+        # number of paragraphs added to the last recognized section
+        section_size = 0
 
-        for praw in document.get_doc_paragraphs_iter():
+        for para in records:
 
-            para = DOCXParagraph(praw, docx=document)
             # self.addParagraph(p)
             pid = para.getId()
             logger.debug('----> (%02d) Paragraph %s', par_iter, pid)
@@ -376,6 +570,23 @@ class ASOZDParser(DOCXDocument):
 
             p_type = self.recognize_paragraph(para)
 
+            if last_recognized_type and (
+                    p_type or
+                    self.is_section_full(last_recognized_type, section_size)):
+                # the last recognized section is closed
+                if types[last_recognized_type].stop_parsing_when_closed:
+                    logger.info(
+                        'Section [%s] is closed. Stop parsing.',
+                        last_recognized_type
+                    )
+                    break
+                if not p_type:
+                    logger.debug(
+                        'Section [%s] is full. Skipping paragraph %s.',
+                        last_recognized_type, pid
+                    )
+                    continue
+
             if p_type or last_recognized_type:
 
                 # forming paragraph text as joining raw
@@ -394,7 +605,7 @@ class ASOZDParser(DOCXDocument):
 
                 # determine if we have to find something
                 # within recognized paragraph
-                extra_types_list = self.get_config(work_type, 'also_contains')
+                extra_types_list = types[work_type].also_contains
                 if extra_types_list:
 
                     logger.debug('Found {} extra types: {}'.format(
@@ -402,54 +613,54 @@ class ASOZDParser(DOCXDocument):
                         )
                     )
                     for extra_type in extra_types_list:
-                        if self.get_config(extra_type, 'is_image'):
+                        extra_config = types[extra_type]
+                        if extra_config.is_image:
                             logger.debug(
                                 'Try to find images within paragraph...'
                             )
-                            for img in para.getImages():
-                                drw = DOCXDrawing(
-                                    img,
-                                    docx=document,
-                                    debug=self.is_debug()
-                                )
-                                img_name = drw.getImageName()
+                            for rId in para.getImageIds():
+                                img_name = None
+                                if rId:
+                                    img_name = document\
+                                        .get_relationship_target_by_id(rId)
                                 logger.info('Image %s found', img_name)
 
                                 # adding image to result
                                 self.add_result_image(extra_type, img_name)
 
-                        elif self.get_config(extra_type, 'text_re'):
+                        elif extra_config.text_re:
 
                             # check do we need to remove links or not
-                            if self.get_config(extra_type, 'remove_links'):
+                            if extra_config.remove_links:
                                 extra_par_text = para.getCleanedText()
 
                             logger.debug("Found 'text_re' for %s", extra_type)
                             logger.debug(
                                 'Searching [%s] in [%s]',
-                                self.get_config(extra_type, 'text_re'),
-                                extra_par_text
-                            )
-                            match_res = re.search(
-                                self.get_config(extra_type, 'text_re'),
+                                extra_config.text_re.pattern,
                                 extra_par_text
                             )
+                            with self.get_metrics().timer(
+                                    'text_re', len(extra_par_text)), \
+                                    self._paragraph_costs.timer(
+                                        para, 'text_re'):
+                                match_res = search_text_re(
+                                    extra_config, extra_par_text
+                                )
                             if match_res:
                                 search_res = match_res.group(0).strip()
                                 self.add_result(extra_type, search_res)
-                                if (
-                                    not self.get_config(
-                                        extra_type, 'leave_also_contains_data'
-                                        )
-                                   ):
+                                if not extra_config.leave_also_contains_data:
                                     par_text = par_text.replace(search_res, '')
 
                 if p_type:
                     logger.info('Paragraph recognized as [%s]', p_type)
                     last_recognized_type = p_type
+                    section_size = 1
 
                     self.add_result(p_type, par_text, replace_check_re_with='')
                 elif last_recognized_type:
+                    section_size += 1
                     logger.info(
                         'Paragraph hasn`t recognized. Add data to the last '
                         'recognized as [%s]', last_recognized_type
@@ -481,9 +692,21 @@ class ASOZDParser(DOCXDocument):
         if not os.path.exists(out_images_dir):
             os.makedirs(out_images_dir)
 
-    def save_all_results(self, results_dir=None, results_file_name=None):
+    def save_all_results(self,
+                         results_dir=None,
+                         results_file_name=None,
+                         dedup_images=False):
+        """
+        Saving json and images results to the destination folder.
+
+        Returns list of saved file names.
+        """
         self.recreate_dest_folder_sturture(results_dir=results_dir)
-        self.save_results_json(
+        saved = [self.save_results_json(
+            results_dir=results_dir,
+            results_file_name=results_file_name)]
+        saved.extend(self.save_result_images(
             results_dir=results_dir,
-            results_file_name=results_file_name)
-        self.save_result_images(results_dir=results_dir)
+            dedup_images=dedup_images
+        ))
+        return saved
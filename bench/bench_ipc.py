@@ -0,0 +1,98 @@
+"""
+Benchmark of returning exported results from worker processes.
+
+Workers return exported results (see ASOZDParser.export_results) with
+images of the given size, the parent writes images into memory like
+output files writing does. Results are passed:
+  * pickle        - pickled as a whole by ProcessPoolExecutor
+  * shared_memory - large images through shared memory segments
+                    (see shared_results)
+
+Usage (from the repository root):
+
+    python -m bench.bench_ipc --image-sizes 65536,1048576,8388608
+"""
+import io
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from clize import run
+
+from shared_results import attach_exported, share_exported, start_channel
+
+
+logger = logging.getLogger(__name__)
+
+MODES = ['pickle', 'shared_memory']
+
+
+def make_exported(idx: int, image_size: int, shared: bool) -> dict:
+    """Returns exported results of synthetic document"""
+    exported = {
+        'json_file_name': 'document_{}.json'.format(idx),
+        'results': {'fio': 'Иванов Иван Иванович', 'lobby': ['a'] * 10},
+        'images': [('images/document_{}.jpg'.format(idx),
+                    bytes(image_size))],
+    }
+    if shared:
+        exported = share_exported(exported, threshold=0)
+    return exported
+
+
+def run_benchmark(image_size, documents=50, workers=2, repeat=3):
+    """Returns the best wall time of every mode: mode -> seconds"""
+    start_channel()
+    report = {}
+    for mode in MODES:
+        shared = mode == 'shared_memory'
+        best = None
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # workers are started before measurement
+            list(executor.map(make_exported, range(workers),
+                              [0] * workers, [False] * workers))
+            for _ in range(repeat):
+                started = time.perf_counter()
+                for exported in executor.map(
+                        make_exported, range(documents),
+                        [image_size] * documents, [shared] * documents):
+                    with attach_exported(exported) as exported:
+                        for _, image_data in exported['images']:
+                            io.BytesIO().write(image_data)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+        report[mode] = best
+    return report
+
+
+def bench_ipc(*,
+              image_sizes: str = '65536,1048576,8388608',
+              documents: int = 50,
+              workers: int = 2,
+              repeat: int = 3) -> None:
+    """
+    Benchmark passing exported results from worker processes.
+
+    :param image_sizes: Comma separated image sizes in bytes
+    :param documents: Number of documents per measurement
+    :param workers: Number of worker processes
+    :param repeat: Number of measurements (the best one is taken)
+    """
+    if not start_channel():
+        raise SystemExit('Shared memory is not supported')
+
+    for image_size in [int(x) for x in image_sizes.split(',') if x.strip()]:
+        report = run_benchmark(image_size, documents, workers, repeat)
+        print('Image size: {} bytes, documents: {}'.format(
+            image_size, documents
+        ))
+        for mode, seconds in report.items():
+            print('  {:<14} {:>9.4f}s {:>10.1f} docs/s {:>9.1f}x'.format(
+                mode, seconds, documents / seconds,
+                report['pickle'] / seconds
+            ))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    run(bench_ipc)
@@ -0,0 +1,222 @@
+"""
+Benchmark of the parsing pipeline stages on synthetic docx documents.
+
+Measures separately:
+  * load               - DOCXDocument.load (document content)
+  * recognize_paragraph - classification of all document paragraphs
+  * load_paragraphs    - complete parsing of document
+  * save_all_results   - saving json and images
+
+Usage (from the repository root):
+
+    python -m bench.bench_parse --paragraphs 200 --documents 5
+    python -m bench.bench_parse --save-baseline
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from clize import run
+
+from asozd import ASOZDParser
+from bench.docx_factory import make_docx
+
+
+logger = logging.getLogger(__name__)
+
+BENCH_DIR = os.path.dirname(os.path.realpath(__file__))
+BASELINES_FILE_NAME = os.path.join(BENCH_DIR, 'baselines.json')
+
+STAGES = ['load', 'recognize_paragraph', 'load_paragraphs',
+          'save_all_results']
+
+
+def _time_stage(file_name, stage, results_dir, streaming):
+    """Returns wall time of the stage for the file"""
+    with ASOZDParser(file_name, streaming=streaming) as P:
+        if stage == 'load':
+            started = time.perf_counter()
+            P.load()
+            return time.perf_counter() - started
+
+        if stage == 'recognize_paragraph':
+            P.load()
+            records = list(P.get_doc_paragraph_records_iter())
+            started = time.perf_counter()
+            for record in records:
+                P.recognize_paragraph(record)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        P.load_paragraphs()
+        if stage == 'load_paragraphs':
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        P.save_all_results(results_dir=results_dir)
+        return time.perf_counter() - started
+
+
+def _get_peak_memory(file_name, streaming):
+    """Returns peak of allocated memory during the file parsing"""
+    tracemalloc.start()
+    try:
+        with ASOZDParser(file_name, streaming=streaming) as P:
+            P.load_paragraphs()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _count_paragraphs(file_name):
+    with ASOZDParser(file_name) as P:
+        P.load()
+        return sum(1 for _ in P.get_doc_paragraph_records_iter())
+
+
+def run_benchmark(work_dir, documents=3, repeat=3, streaming=False,
+                  **doc_kwargs):
+    """
+    Generates synthetic documents and measures every stage.
+
+    Returns dict with best per document time of every stage,
+    throughput values and peak memory.
+    """
+    file_names = [
+        make_docx(os.path.join(work_dir, 'source_{}.docx'.format(idx)),
+                  **doc_kwargs)
+        for idx in range(documents)
+    ]
+    results_dir = os.path.join(work_dir, 'out')
+    size = sum(os.path.getsize(x) for x in file_names)
+    paragraphs = sum(_count_paragraphs(x) for x in file_names)
+
+    report = {'documents': documents, 'paragraphs': paragraphs,
+              'bytes': size, 'stages': {}}
+    for stage in STAGES:
+        best = min(
+            sum(_time_stage(x, stage, results_dir, streaming)
+                for x in file_names)
+            for _ in range(repeat)
+        )
+        report['stages'][stage] = {
+            'seconds': best,
+            'docs_per_second': documents / best if best else None,
+            'paragraphs_per_second': paragraphs / best if best else None,
+            'mb_per_second': size / 1024 / 1024 / best if best else None,
+        }
+
+    report['peak_memory'] = max(
+        _get_peak_memory(x, streaming) for x in file_names
+    )
+    return report
+
+
+def get_scenario_name(streaming, **doc_kwargs):
+    """Returns scenario name used as a baselines key"""
+    params = ','.join(
+        '{}={}'.format(k, v) for k, v in sorted(doc_kwargs.items())
+    )
+    return '{}:{}'.format('streaming' if streaming else 'soup', params)
+
+
+def load_baselines(file_name=BASELINES_FILE_NAME):
+    try:
+        with open(file_name, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def find_regressions(report, baseline, tolerance):
+    """Returns list of descriptions of values worse than baseline ones"""
+    regressions = []
+    for stage, values in report['stages'].items():
+        base = baseline['stages'].get(stage)
+        if base and values['seconds'] > base['seconds'] * (1 + tolerance):
+            regressions.append('{}: {:.4f}s vs baseline {:.4f}s'.format(
+                stage, values['seconds'], base['seconds']
+            ))
+
+    if report['peak_memory'] > baseline['peak_memory'] * (1 + tolerance):
+        regressions.append('peak_memory: {} vs baseline {}'.format(
+            report['peak_memory'], baseline['peak_memory']
+        ))
+    return regressions
+
+
+def bench(*,
+          paragraphs: int = 50,
+          runs: int = 3,
+          hyperlinks: int = 2,
+          images: int = 1,
+          lobby_items: int = 10,
+          documents: int = 3,
+          repeat: int = 3,
+          streaming: bool = False,
+          save_baseline: bool = False,
+          tolerance: float = 0.2) -> None:
+    """
+    Benchmark parsing stages on synthetic docx documents.
+
+    :param paragraphs: Number of paragraphs per document section
+    :param runs: Number of <w:r> runs every paragraph is split into
+    :param hyperlinks: Number of paragraphs with hyperlink per section
+    :param images: Number of images in document
+    :param lobby_items: Length of the lobby list
+    :param documents: Number of generated documents
+    :param repeat: Number of measurements (the best one is taken)
+    :param streaming: Use streaming document parsing
+    :param save_baseline: Store results as a baseline for the scenario
+    :param tolerance: Allowed slowdown against baseline (0.2 = 20%)
+    """
+    doc_kwargs = {
+        'paragraphs': paragraphs, 'runs': runs, 'hyperlinks': hyperlinks,
+        'images': images, 'lobby_items': lobby_items,
+    }
+    scenario = get_scenario_name(streaming, **doc_kwargs)
+
+    work_dir = tempfile.mkdtemp(prefix='asozd_bench_')
+    try:
+        report = run_benchmark(work_dir, documents=documents, repeat=repeat,
+                               streaming=streaming, **doc_kwargs)
+    finally:
+        shutil.rmtree(work_dir)
+
+    print('Scenario: {}'.format(scenario))
+    print('Documents: {documents}, paragraphs: {paragraphs}, '
+          'bytes: {bytes}'.format(**report))
+    for stage, values in report['stages'].items():
+        print('  {:<20} {:>9.4f}s {:>10.1f} docs/s {:>12.1f} par/s '
+              '{:>8.2f} MB/s'.format(
+                  stage, values['seconds'], values['docs_per_second'],
+                  values['paragraphs_per_second'], values['mb_per_second']
+              ))
+    print('  {:<20} {:>9.1f} KiB'.format(
+        'peak_memory', report['peak_memory'] / 1024
+    ))
+
+    baselines = load_baselines()
+    if save_baseline:
+        baselines[scenario] = report
+        with open(BASELINES_FILE_NAME, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print('Baseline saved to {}'.format(BASELINES_FILE_NAME))
+    elif scenario in baselines:
+        regressions = find_regressions(
+            report, baselines[scenario], tolerance
+        )
+        for regression in regressions:
+            print('REGRESSION {}'.format(regression))
+        if regressions:
+            raise SystemExit(1)
+        print('No regressions against baseline.')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    run(bench)
@@ -0,0 +1,149 @@
+"""
+Benchmark of config regular expressions on pathological inputs.
+
+Every `check_re` and `not_re` (applied with `match` as classifier does)
+and `text_re` (applied with `search` and with search_text_re keywords
+prefilter) is measured on long texts of growing size:
+  * words          - Cyrillic words separated with spaces, no match
+  * letters        - one Cyrillic letter repeated
+  * spaces         - spaces only
+  * links          - unclosed '<a' tags
+  * keyword_at_end - words with `family` keyword in the end
+  * keyword_after_run - letters, a digit and `family` keyword in the end,
+                      keywords prefilter doesn't help here, the
+                      expression itself has to avoid backtracking
+
+Expressions are also measured with `regex` module if it's installed.
+
+Usage (from the repository root):
+
+    python -m bench.bench_regex --sizes 1000,4000
+    python -m bench.bench_regex --budget 0.05
+"""
+import logging
+import re
+import time
+
+from clize import run
+
+from compiled_config import get_default_config, search_text_re
+
+
+logger = logging.getLogger(__name__)
+
+INPUTS = {
+    'words': lambda size: ('Родился в городе Москва и работал ' * size)[:size],
+    'letters': lambda size: 'а' * size,
+    'spaces': lambda size: ' ' * size,
+    'links': lambda size: ('<a' * size)[:size],
+    'keyword_at_end': lambda size: (
+        ('Родился в городе Москва и работал ' * size)[:size] + ' Женат.'
+    ),
+    'keyword_after_run': lambda size: 'а' * size + '1 Женат.',
+}
+
+
+def _time_call(func, text, repeat):
+    """Returns the best wall time of the call"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def get_engines(type_config, key):
+    """Returns engine name -> function applying the type expression"""
+    pattern = getattr(type_config, key).pattern
+    method = 'search' if key == 'text_re' else 'match'
+
+    engines = {'re': getattr(re.compile(pattern), method)}
+    if key == 'text_re':
+        engines['re+keywords'] = lambda text: search_text_re(
+            type_config, text
+        )
+
+    try:
+        import regex
+    except ImportError:
+        pass
+    else:
+        engines['regex'] = getattr(regex.compile(pattern), method)
+    return engines
+
+
+def run_benchmark(sizes=(1000, 4000), repeat=3):
+    """
+    Measures every config expression on every input of every size.
+
+    Returns list of dicts with 'type', 'key', 'engine', 'input',
+    'size' and 'seconds' keys.
+    """
+    compiled = get_default_config()
+    report = []
+    for type_config in compiled.types.values():
+        for key in ['check_re', 'not_re', 'text_re']:
+            if getattr(type_config, key) is None:
+                continue
+            for engine, func in get_engines(type_config, key).items():
+                for input_name, make_input in INPUTS.items():
+                    for size in sizes:
+                        report.append({
+                            'type': type_config.name,
+                            'key': key,
+                            'engine': engine,
+                            'input': input_name,
+                            'size': size,
+                            'seconds': _time_call(
+                                func, make_input(size), repeat
+                            ),
+                        })
+    return report
+
+
+def bench_regex(*,
+                sizes: str = '1000,4000',
+                repeat: int = 3,
+                budget: float = None) -> None:
+    """
+    Benchmark config regular expressions on pathological inputs.
+
+    If `budget` is passed, exits with status 1 if any expression
+    applied the way parser does ('re' engine for check_re and not_re,
+    're+keywords' for text_re) is slower than the budget.
+
+    :param sizes: Comma separated input text sizes in chars
+    :param repeat: Number of measurements (the best one is taken)
+    :param budget: Max allowed time of one expression call in seconds
+    """
+    report = run_benchmark(
+        sizes=[int(x) for x in sizes.split(',') if x.strip()],
+        repeat=repeat
+    )
+
+    slow = []
+    for item in report:
+        parser_engine = 're+keywords' if item['key'] == 'text_re' else 're'
+        is_slow = budget is not None and \
+            item['engine'] == parser_engine and item['seconds'] > budget
+        if is_slow:
+            slow.append(item)
+        print('  {:<12} {:<9} {:<12} {:<17} {:>7} {:>10.6f}s{}'.format(
+            item['type'], item['key'], item['engine'], item['input'],
+            item['size'], item['seconds'], '  SLOW' if is_slow else ''
+        ))
+
+    if slow:
+        print('{} expression calls are over {}s budget'.format(
+            len(slow), budget
+        ))
+        raise SystemExit(1)
+    if budget is not None:
+        print('All expressions are within {}s budget.'.format(budget))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    run(bench_regex)
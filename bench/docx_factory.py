@@ -0,0 +1,234 @@
+"""
+Synthetic ASOZD-shaped docx documents generator.
+
+Documents follow the structure expected by `parser_config.config`:
+fio (with photo), position, fraction, bio, relations (with family),
+submitted, conclusion and lobby sections.
+"""
+import base64
+import os
+from xml.sax.saxutils import escape, quoteattr
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+
+DOCUMENT_NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:w14="http://schemas.microsoft.com/office/word/2010/wordml" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships" '
+    'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/'
+    'wordprocessingDrawing" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture"'
+)
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+    'content-types">'
+    '<Default Extension="rels" ContentType="application/'
+    'vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="png" ContentType="image/png"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+    'relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+    'officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+HYPERLINK_TYPE = (r'http://schemas.openxmlformats.org/officeDocument/'
+                  r'2006/relationships/hyperlink')
+IMAGE_TYPE = (r'http://schemas.openxmlformats.org/officeDocument/'
+              r'2006/relationships/image')
+
+# 1x1 transparent png
+PNG_DATA = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChw'
+    'GA60e6kgAAAABJRU5ErkJggg=='
+)
+
+FIO = 'Иванов Иван Иванович'
+SENTENCE = ('Родился 9 июля 1976 г. в Кемеровской области, окончил '
+            'государственный университет и работал в краевом совете. ')
+
+
+class SyntheticDocument(object):
+    """Builder of synthetic docx document content"""
+
+    def __init__(self,
+                 paragraphs: int = 10,
+                 runs: int = 3,
+                 hyperlinks: int = 2,
+                 images: int = 1,
+                 lobby_items: int = 3,
+                 image_size: int = 0,
+                 shapes: int = 0,
+                 fio: str = FIO):
+        self.paragraphs = paragraphs
+        self.runs = max(runs, 1)
+        self.hyperlinks = hyperlinks
+        self.images = images
+        self.lobby_items = lobby_items
+        self.image_size = image_size
+        self.shapes = shapes
+        self.fio = fio
+
+        self._body = []
+        self._rels = []
+        self._media = []
+        self._para_id = 0
+        self._shape_id = 0
+
+    def _rel(self, rel_type, target, external=False):
+        rel_id = 'rId{}'.format(len(self._rels) + 1)
+        self._rels.append(
+            '<Relationship Id="{}" Type="{}" Target={}{}/>'.format(
+                rel_id, rel_type, quoteattr(target),
+                ' TargetMode="External"' if external else ''
+            )
+        )
+        return rel_id
+
+    @staticmethod
+    def _run(text):
+        return ('<w:r><w:rPr><w:sz w:val="24"/></w:rPr>'
+                '<w:t xml:space="preserve">{}</w:t></w:r>'.format(escape(text)))
+
+    def _runs(self, text):
+        """Splits text into `runs` runs"""
+        size = max(len(text) // self.runs, 1)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        return ''.join(self._run(x) for x in chunks)
+
+    def _hyperlink(self, text, url):
+        rel_id = self._rel(HYPERLINK_TYPE, url, external=True)
+        return '<w:hyperlink r:id="{}">{}</w:hyperlink>'.format(
+            rel_id, self._run(text)
+        )
+
+    def _drawing(self):
+        idx = len(self._media) + 1
+        name = 'media/image{}.png'.format(idx)
+        self._media.append(
+            (name, PNG_DATA + b'\0' * self.image_size)
+        )
+        rel_id = self._rel(IMAGE_TYPE, name)
+        return (
+            '<w:r><w:drawing><wp:inline>'
+            '<wp:docPr id="{idx}" name="image{idx}.png"/>'
+            '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/'
+            'drawingml/2006/picture"><pic:pic><pic:blipFill>'
+            '<a:blip r:embed="{rel_id}"/></pic:blipFill></pic:pic>'
+            '</a:graphicData></a:graphic></wp:inline></w:drawing></w:r>'
+        ).format(idx=idx, rel_id=rel_id)
+
+    def _shape(self):
+        """Returns drawing of a text box shape, which isn't a picture"""
+        self._shape_id += 1
+        return (
+            '<w:r><w:drawing><wp:anchor>'
+            '<wp:docPr id="{idx}" name="Shape {idx}"/>'
+            '<a:graphic><a:graphicData uri="http://schemas.microsoft.com/'
+            'office/word/2010/wordprocessingShape">'
+            '<wps:wsp xmlns:wps="http://schemas.microsoft.com/office/word/'
+            '2010/wordprocessingShape"><wps:spPr/><wps:bodyPr/></wps:wsp>'
+            '</a:graphicData></a:graphic></wp:anchor></w:drawing></w:r>'
+        ).format(idx=1000 + self._shape_id)
+
+    def _paragraph(self, content):
+        self._para_id += 1
+        self._body.append(
+            '<w:p w14:paraId="{:08X}"><w:pPr><w:jc w:val="left"/></w:pPr>'
+            '{}</w:p>'.format(self._para_id, content)
+        )
+
+    def _section(self, title, text=SENTENCE):
+        self._paragraph(self._run(title))
+        for idx in range(self.paragraphs):
+            content = self._runs('{} {}'.format(idx, text * 3))
+            if idx < self.hyperlinks:
+                content += self._hyperlink(
+                    'ссылка', 'http://example.com/{}'.format(self._para_id)
+                ) + self._run(' ({}).'.format(idx + 1))
+            self._paragraph(content)
+
+    def build(self):
+        """Fills the document with all sections"""
+        self._paragraph(
+            self._run(self.fio) +
+            ''.join(self._drawing() for _ in range(self.images)) +
+            ''.join(self._shape() for _ in range(self.shapes))
+        )
+        self._paragraph(self._runs(
+            'Депутат Государственной Думы VII созыва, избран от '
+            'избирательного округа 0039'
+        ))
+        self._paragraph(
+            self._run('Фракция ') + self._hyperlink(
+                '“Единая Россия”', 'http://www.duma.gov.ru/structure/'
+            )
+        )
+        self._section('Биография:')
+        self._section('Аффиляция, связи:')
+        self._paragraph(self._runs('Женат, имеет двух сыновей.'))
+        self._section('Внесенные законопроекты:')
+        self._section('Выводы:')
+
+        self._paragraph(self._run('Группы лоббистов:'))
+        for idx in range(self.lobby_items):
+            self._paragraph(
+                self._run('лобби {}/Алтайский край'.format(idx + 1))
+            )
+
+        return self
+
+    def get_document_xml(self):
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document {}><w:body>{}<w:sectPr/></w:body></w:document>'
+        ).format(DOCUMENT_NAMESPACES, ''.join(self._body))
+
+    def get_relationships_xml(self):
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/'
+            'package/2006/relationships">{}</Relationships>'
+        ).format(''.join(self._rels))
+
+    def save(self, file_name: str) -> None:
+        """Saves document as docx file"""
+        with ZipFile(file_name, 'w', ZIP_DEFLATED) as zf:
+            zf.writestr('[Content_Types].xml', CONTENT_TYPES)
+            zf.writestr('_rels/.rels', PACKAGE_RELS)
+            zf.writestr('word/document.xml', self.get_document_xml())
+            zf.writestr(
+                'word/_rels/document.xml.rels', self.get_relationships_xml()
+            )
+            for name, data in self._media:
+                # images are usually stored without compression
+                zf.writestr('word/' + name, data, compress_type=ZIP_STORED)
+
+
+def make_docx(file_name: str, **kwargs) -> str:
+    """
+    Creates synthetic docx file and returns its name.
+
+    Keyword arguments are passed to SyntheticDocument:
+    `paragraphs` (per section), `runs` (per paragraph), `hyperlinks`
+    (per section), `images`, `lobby_items`, `image_size`, `shapes`
+    (text boxes next to images) and `fio`.
+    """
+    dir_name = os.path.dirname(file_name)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    SyntheticDocument(**kwargs).build().save(file_name)
+    return file_name
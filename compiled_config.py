@@ -0,0 +1,344 @@
+"""
+Compiled parser configuration.
+
+`parser_config.config` dict is validated and compiled once per process
+into immutable structure:
+  * TypeConfig - settings of one content type with precompiled regular
+    expressions and typed flags
+  * CompiledConfig - table of all types, types recognized by `check_re`
+    in `order_id` order and ParagraphClassifier for them
+
+`text_re` is searched with search_text_re(), which skips texts without
+any of `text_re_keywords` literals and limits search time with
+`text_re_timeout` seconds (requires `regex` package).
+
+Unknown settings, wrong values and bad regular expressions are
+reported with ConfigError when the config is compiled.
+"""
+import collections
+import functools
+import logging
+import re
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Pattern, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# matches numeric and named back references which couldn't be
+# used within joined regular expression
+BACKREFERENCE_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+class ConfigError(ValueError):
+    """Parser config is not valid"""
+
+
+class TypeConfig(NamedTuple):
+    """Settings of one content type (see parser_config.py)"""
+    name: str
+    order_id: int
+    check_re: Optional[Pattern] = None
+    not_re: Optional[Pattern] = None
+    text_re: Optional[Pattern] = None
+    also_contains: Tuple[str, ...] = ()
+    next_items: Tuple[str, ...] = ()
+    is_image: bool = False
+    do_not_replace_check_re: bool = False
+    leave_also_contains_data: bool = False
+    remove_links: bool = False
+    list_of_strings: bool = False
+    remove_empty_items: bool = False
+    strip_items: bool = False
+    collapse_whitespace: bool = False
+    dedupe_items: bool = False
+    max_paragraphs: Optional[int] = None
+    stop_parsing_when_closed: bool = False
+    text_re_keywords: Tuple[str, ...] = ()
+    text_re_timeout: Optional[float] = None
+
+
+class CompiledConfig(NamedTuple):
+    """Validated and compiled parser config"""
+    # all types in the config order: type -> TypeConfig
+    types: Mapping[str, TypeConfig]
+    # types with `check_re` sorted by `order_id`
+    ordered: Tuple[TypeConfig, ...]
+    classifier: 'ParagraphClassifier'
+
+
+_REGEXP_KEYS = ['check_re', 'not_re', 'text_re']
+_TYPES_LIST_KEYS = ['also_contains', 'next_items']
+_FLAG_KEYS = ['is_image', 'do_not_replace_check_re',
+              'leave_also_contains_data', 'remove_links',
+              'list_of_strings', 'remove_empty_items', 'strip_items',
+              'collapse_whitespace', 'dedupe_items',
+              'stop_parsing_when_closed']
+
+
+class ParagraphClassifier(object):
+    """
+    Compiled classifier of paragraph types.
+
+    All `check_re` regular expressions from the config are joined into
+    one alternation regular expression with named group per type
+    following `order_id` priority, so paragraph text is matched once.
+    `not_re` expressions are checked only for the matched type.
+    """
+
+    def __init__(self, types):
+        """`types` is a sequence of TypeConfig sorted by priority"""
+        self._types = [item.name for item in types]
+        self._check_re = [item.check_re for item in types]
+        self._not_re = [item.not_re for item in types]
+
+        self._joined_re = None
+        patterns = [item.check_re.pattern for item in types]
+        if not any(BACKREFERENCE_RE.search(x) for x in patterns):
+            try:
+                self._joined_re = re.compile('|'.join(
+                    '(?P<t{}>{})'.format(idx, pattern)
+                    for idx, pattern in enumerate(patterns)
+                ))
+            except re.error:
+                logger.warning(
+                    'Couldn''t join check_re expressions, '
+                    'they will be applied one by one.'
+                )
+
+    def _classify_from(self, text, start_idx):
+        """Applies check_re expressions one by one starting from index"""
+        for idx in range(start_idx, len(self._types)):
+            if self._check_re[idx].match(text) and not (
+                    self._not_re[idx] and self._not_re[idx].match(text)):
+                return self._types[idx]
+        return None
+
+    def classify(self, text):
+        """Returns type of the (cleaned and stripped) paragraph text"""
+        if self._joined_re is None:
+            return self._classify_from(text, 0)
+
+        match_res = self._joined_re.match(text)
+        if not match_res:
+            return None
+
+        idx = int(match_res.lastgroup[1:])
+        if self._not_re[idx] and self._not_re[idx].match(text):
+            # matched type is rejected, so trying types with lower priority
+            return self._classify_from(text, idx + 1)
+        return self._types[idx]
+
+
+def _compile_type(res_type, settings):
+    """Returns TypeConfig for `res_type` settings dict"""
+    if not isinstance(settings, dict):
+        raise ConfigError("Type '{}' settings must be a dict".format(res_type))
+
+    unknown = set(settings) - set(TypeConfig._fields)
+    if unknown:
+        raise ConfigError("Unknown settings of type '{}': {}".format(
+            res_type, ', '.join(sorted(unknown))
+        ))
+
+    values = {'name': res_type}
+
+    name = settings.get('name', res_type)
+    if not isinstance(name, str):
+        raise ConfigError("Type '{}' name must be a string".format(res_type))
+
+    order_id = settings.get('order_id')
+    if not isinstance(order_id, int) or isinstance(order_id, bool):
+        raise ConfigError(
+            "Type '{}' order_id must be an integer".format(res_type)
+        )
+    values['order_id'] = order_id
+
+    for key in _REGEXP_KEYS:
+        pattern = settings.get(key)
+        if pattern is None:
+            continue
+        if not isinstance(pattern, str):
+            raise ConfigError(
+                "Type '{}' {} must be a string".format(res_type, key)
+            )
+        try:
+            values[key] = re.compile(pattern)
+        except re.error as e:
+            raise ConfigError("Type '{}' {} is not valid: {}".format(
+                res_type, key, e
+            ))
+
+    for key in _TYPES_LIST_KEYS:
+        items = settings.get(key) or []
+        if not isinstance(items, (list, tuple)) or not all(
+                isinstance(x, str) for x in items):
+            raise ConfigError(
+                "Type '{}' {} must be a list of types".format(res_type, key)
+            )
+        values[key] = tuple(items)
+
+    for key in _FLAG_KEYS:
+        flag = settings.get(key, False)
+        if not isinstance(flag, bool):
+            raise ConfigError(
+                "Type '{}' {} must be True or False".format(res_type, key)
+            )
+        values[key] = flag
+
+    max_paragraphs = settings.get('max_paragraphs')
+    if max_paragraphs is not None and (
+            not isinstance(max_paragraphs, int) or
+            isinstance(max_paragraphs, bool) or max_paragraphs < 1):
+        raise ConfigError(
+            "Type '{}' max_paragraphs must be a positive integer".format(
+                res_type
+            )
+        )
+    values['max_paragraphs'] = max_paragraphs
+
+    keywords = settings.get('text_re_keywords') or []
+    if not isinstance(keywords, (list, tuple)) or not all(
+            isinstance(x, str) and x for x in keywords):
+        raise ConfigError(
+            "Type '{}' text_re_keywords must be a list of strings".format(
+                res_type
+            )
+        )
+    values['text_re_keywords'] = tuple(keywords)
+
+    timeout = settings.get('text_re_timeout')
+    if timeout is not None:
+        if not isinstance(timeout, (int, float)) or \
+                isinstance(timeout, bool) or timeout <= 0:
+            raise ConfigError(
+                "Type '{}' text_re_timeout must be a positive number".format(
+                    res_type
+                )
+            )
+        values['text_re_timeout'] = float(timeout)
+        if values.get('text_re'):
+            values['text_re'] = _compile_with_timeout(
+                res_type, values['text_re'].pattern
+            )
+
+    return TypeConfig(**values)
+
+
+def _compile_with_timeout(res_type, pattern):
+    """Compiles `pattern` with `regex` module supporting timeouts"""
+    try:
+        import regex
+    except ImportError:
+        raise ConfigError(
+            "Type '{}' text_re_timeout requires 'regex' package "
+            "installed".format(res_type)
+        )
+    try:
+        return regex.compile(pattern)
+    except regex.error as e:
+        raise ConfigError("Type '{}' text_re is not valid: {}".format(
+            res_type, e
+        ))
+
+
+def search_text_re(type_config: TypeConfig, text: str):
+    """
+    Returns match of the type `text_re` within the text or None.
+
+    Search is skipped if the text contains none of `text_re_keywords`
+    and is cut off after `text_re_timeout` seconds.
+    """
+    keywords = type_config.text_re_keywords
+    if keywords and not any(x in text for x in keywords):
+        return None
+
+    if type_config.text_re_timeout is None:
+        return type_config.text_re.search(text)
+
+    try:
+        return type_config.text_re.search(
+            text, timeout=type_config.text_re_timeout
+        )
+    except TimeoutError:
+        logger.warning(
+            "'text_re' of type '%s' has timed out on %d chars text",
+            type_config.name, len(text)
+        )
+        return None
+
+
+def compile_config(config: dict) -> CompiledConfig:
+    """Validates and compiles parser config dict"""
+    if not isinstance(config, dict) or not isinstance(
+            config.get('types'), dict):
+        raise ConfigError("Config must be a dict with 'types' dict")
+
+    unknown = set(config) - {'types'}
+    if unknown:
+        raise ConfigError('Unknown config settings: {}'.format(
+            ', '.join(sorted(unknown))
+        ))
+
+    types = {
+        res_type: _compile_type(res_type, settings)
+        for res_type, settings in config['types'].items()
+    }
+
+    for type_config in types.values():
+        for key in _TYPES_LIST_KEYS:
+            for item in getattr(type_config, key):
+                if item not in types:
+                    raise ConfigError(
+                        "Type '{}' {} refers unknown type '{}'".format(
+                            type_config.name, key, item
+                        )
+                    )
+
+    ordered = tuple(sorted(
+        [x for x in types.values() if x.check_re],
+        key=lambda x: x.order_id
+    ))
+    return CompiledConfig(
+        types=MappingProxyType(types),
+        ordered=ordered,
+        classifier=ParagraphClassifier(ordered)
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_default_config() -> CompiledConfig:
+    """Returns `parser_config.config` compiled once per process"""
+    from parser_config import config
+
+    return compile_config(config)
+
+
+# number of the last used custom configs kept compiled
+COMPILED_CONFIGS_CACHE_SIZE = 8
+
+# compiled custom configs LRU cache: id(config) -> (config, compiled)
+_compiled_configs = collections.OrderedDict()
+
+
+def get_compiled_config(config: dict = None) -> CompiledConfig:
+    """
+    Returns compiled config for the config dict.
+
+    Default config is used if `config` is None, `parser_config.config`
+    shares the get_default_config() result. The last
+    COMPILED_CONFIGS_CACHE_SIZE custom config dicts are kept compiled.
+    """
+    from parser_config import config as default_config
+
+    if config is None or config is default_config:
+        return get_default_config()
+
+    cached = _compiled_configs.get(id(config))
+    if cached is None or cached[0] is not config:
+        cached = (config, compile_config(config))
+        _compiled_configs[id(config)] = cached
+        while len(_compiled_configs) > COMPILED_CONFIGS_CACHE_SIZE:
+            _compiled_configs.popitem(last=False)
+    _compiled_configs.move_to_end(id(config))
+    return cached[1]
@@ -1,5 +1,34 @@
-from .items import DOCXParagraph, DOCXItem  # noqa
-from .items import DOCXText, DOCXDrawing, DOCXHyperlink  # noqa
-from .document import DOCXDocument  # noqa
+"""
+Package for reading docx documents.
+
+Public classes are imported on the first access, so importing
+the package doesn't import bs4 and lxml.
+"""
+import importlib
+
+# public name -> module of the package
+_EXPORTS = {
+    'DOCXParagraph': '.items',
+    'DOCXItem': '.items',
+    'DOCXText': '.items',
+    'DOCXDrawing': '.items',
+    'DOCXHyperlink': '.items',
+    'Metrics': '.metrics',
+    'ParagraphCosts': '.metrics',
+    'DOCXParagraphRecord': '.records',
+    'DOCXDocument': '.document',
+}
+
+__all__ = list(_EXPORTS)
 
 __version__ = '0.1'
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(
+            'module {!r} has no attribute {!r}'.format(__name__, name)
+        )
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
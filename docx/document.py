@@ -2,15 +2,20 @@
 Contains definition of DOCXDocument class.
 Provides basic routines for working with docx files.
 """
+import io
 import logging
 import os
-from pathlib import PurePath
-from pprint import pprint
-from zipfile import ZipFile
+import shutil
+import struct
+import time
+import zlib
+from zipfile import (ZIP_STORED, BadZipFile, ZipFile, sizeFileHeader,
+                     stringFileHeader, structFileHeader)
 
-from bs4 import BeautifulSoup
+from .metrics import NULL_METRICS
 
-from .items import DOCXParagraph
+# bs4, lxml and docx items are imported on demand to keep import
+# of the module (and CLI startup) cheap
 
 
 logger = logging.getLogger(__name__)
@@ -23,24 +28,66 @@ DOCX_CONTENTS_FILE_NAME = r'word/document.xml'
 DOCX_RELS_FILE_NAME = r'word/_rels/document.xml.rels'
 DOCX_IMG_DIR_NAME = r'word'
 
+# buffer size used for copying of docx members
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# the same as docx.records.W_NAMESPACE
+W_NAMESPACE = r'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+# fully qualified (Clark notation) tag names used by streaming parser
+W_BODY_TAG = '{%s}body' % W_NAMESPACE
+W_PARAGRAPH_TAG = '{%s}p' % W_NAMESPACE
+
+RELS_NAMESPACE = (
+    'http://schemas.openxmlformats.org/package/2006/relationships'
+)
+RELATIONSHIP_TAG = '{%s}Relationship' % RELS_NAMESPACE
+
+
+def _iter_chunks(f, size, buffer_size=COPY_BUFFER_SIZE):
+    """Yields `size` bytes read from the file in chunks"""
+    while size > 0:
+        chunk = f.read(min(buffer_size, size))
+        if not chunk:
+            break
+        size -= len(chunk)
+        yield chunk
+
 
 class DOCXDocument(object):
     """Definition and common routines for docx document."""
 
-    rels_dict = {}
-
     _debug = False
+    _streaming = False
     _VERSION = None
 
     _is_already_opened = False
     _version_check_complete = False
 
-    def __init__(self, file_name: str, **kwargs):
+    def __init__(self, file_name, **kwargs):
+        """
+        `file_name` is a docx file name, its content (bytes, bytearray
+        or memoryview) or a binary file-like object.
+        """
+        if isinstance(file_name, (bytes, bytearray, memoryview)):
+            file_name = io.BytesIO(file_name)
         self.file_name = file_name
 
         if kwargs.get('debug'):
             self._debug = kwargs['debug']
 
+        # streaming mode walks <w:body> with lxml.etree.iterparse
+        # instead of building the whole BeautifulSoup tree
+        if kwargs.get('streaming'):
+            self._streaming = kwargs['streaming'] is True
+
+        # opt-in instrumentation of parsing stages (docx.metrics.Metrics)
+        self._metrics = kwargs.get('metrics') or NULL_METRICS
+
+        # relationships are loaded on demand
+        # by get_relationship_target_by_id()
+        self._rels_dict = None
+
         self._open_docx()
         self._docx_paragraph_iterator = []
         self._docx_body = None
@@ -48,15 +95,28 @@ class DOCXDocument(object):
     def _dbg(self, msg):
         raise NotImplementedError
 
+    def get_display_name(self) -> str:
+        """Returns file name of docx or '<bytes>' for in-memory content"""
+        if isinstance(self.file_name, (str, os.PathLike)):
+            return os.fspath(self.file_name)
+        name = getattr(self.file_name, 'name', None)
+        return name if isinstance(name, str) else '<bytes>'
+
     def __enter__(self):
         self._open_docx()
         return self
 
     def __exit__(self, res_type, value, traceback):
         # Exception handling here
-        self._rels.close()
-        self._doc.close()
-        self._zipfile.close()
+        self.close()
+
+    def close(self) -> None:
+        """Closes Document content and docx file pointers"""
+        if self._is_already_opened:
+            self._doc.close()
+            self._zipfile.close()
+
+            self._is_already_opened = False
 
     def get_ms_word_version(self):
         """
@@ -73,6 +133,8 @@ class DOCXDocument(object):
             # 15.0000 = Word 2013
             # 16.0000 = Word 2016
 
+            from bs4 import BeautifulSoup
+
             app_fn: str = os.path.join('docProps', 'app.xml')
             try:
                 soup = BeautifulSoup(
@@ -89,6 +151,14 @@ class DOCXDocument(object):
 
         return res_version
 
+    def is_streaming(self):
+        """Returns True if document paragraphs are read in streaming mode"""
+        return self._streaming is True
+
+    def get_metrics(self):
+        """Returns parsing stages metrics collector"""
+        return self._metrics
+
     @property
     def zip_file(self):
         """ZipFile pointer to docx."""
@@ -106,24 +176,122 @@ class DOCXDocument(object):
             '{}/{}'.format(DOCX_IMG_DIR_NAME, image_name), 'r'
         )
 
+    def _get_stored_member_offset(self, info):
+        """
+        Returns offset of raw data of not compressed member within
+        docx file or None if the member couldn't be copied as is.
+        """
+        if info.compress_type != ZIP_STORED or info.flag_bits & 0x1:
+            # compressed or encrypted
+            return None
+        if not isinstance(self.file_name, (str, os.PathLike)):
+            return None
+
+        with open(self.file_name, 'rb') as f:
+            f.seek(info.header_offset)
+            header = f.read(sizeFileHeader)
+        if len(header) != sizeFileHeader:
+            return None
+
+        header = struct.unpack(structFileHeader, header)
+        if header[0] != stringFileHeader:
+            return None
+        # local header is followed by file name and extra field
+        return info.header_offset + sizeFileHeader + header[10] + header[11]
+
+    def copy_docx_image(self, image_name, fdst,
+                        buffer_size=COPY_BUFFER_SIZE) -> int:
+        """
+        Copies image with 'image_name' within docx to `fdst` file object.
+
+        Not compressed images (which is usual for already compressed
+        formats) are copied as raw bytes of docx file, with os.sendfile()
+        if it's available. CRC of copied bytes is checked the same way
+        ZipFile does (BadZipFile is raised), the range sent with
+        os.sendfile() is read back for it. Returns number of copied bytes.
+        """
+        info = self.zip_file.getinfo(
+            '{}/{}'.format(DOCX_IMG_DIR_NAME, image_name)
+        )
+        offset = self._get_stored_member_offset(info)
+        if offset is None:
+            with self.zip_file.open(info, 'r') as fsrc:
+                shutil.copyfileobj(fsrc, fdst, buffer_size)
+            return info.file_size
+
+        with open(self.file_name, 'rb') as fsrc:
+            fdst.flush()
+            copied = 0
+            if hasattr(os, 'sendfile'):
+                try:
+                    while copied < info.file_size:
+                        sent = os.sendfile(
+                            fdst.fileno(), fsrc.fileno(),
+                            offset + copied, info.file_size - copied
+                        )
+                        if not sent:
+                            break
+                        copied += sent
+                except (OSError, ValueError):
+                    # not supported for the files, copying below
+                    pass
+                if copied:
+                    # sendfile writes to the descriptor directly
+                    fdst.seek(0, os.SEEK_END)
+
+            crc = 0
+            fsrc.seek(offset)
+            for chunk in _iter_chunks(fsrc, copied, buffer_size):
+                crc = zlib.crc32(chunk, crc)
+
+            for chunk in _iter_chunks(fsrc, info.file_size - copied,
+                                      buffer_size):
+                fdst.write(chunk)
+                crc = zlib.crc32(chunk, crc)
+                copied += len(chunk)
+
+        if copied != info.file_size:
+            raise ValueError('Truncated docx member: {}'.format(info.filename))
+        if crc != info.CRC:
+            raise BadZipFile('Bad CRC-32 for file {!r}'.format(info.filename))
+        return copied
+
     def load(self) -> None:
-        """Loads relationship and document content data into the clas instance"""
-        self.load_relationships_data()
+        """
+        Loads document content data into the class instance.
+
+        Relationships are loaded on the first access.
+        """
         self.load_document_data()
 
     def _open_docx(self) -> None:
-        """Open docx document and set pointer objects for Relationships and Document content"""
+        """Open docx document and set pointer object for Document content"""
         if not self._is_already_opened:
+            started = time.perf_counter()
+
             self._zipfile = ZipFile(self.file_name, 'r')
-            self._rels = self._zipfile.open(DOCX_RELS_FILE_NAME, 'r')
             self._doc = self._zipfile.open(DOCX_CONTENTS_FILE_NAME, 'r')
 
             self._is_already_opened = True
 
+            if self._metrics.is_enabled():
+                self._metrics.add(
+                    '_open_docx',
+                    time.perf_counter() - started,
+                    sum(x.compress_size for x in self._zipfile.infolist())
+                )
+
     def get_document_raw_data(self):
         """Return raw Document data from docx file"""
         return self._doc.read()
 
+    @property
+    def rels_dict(self):
+        """Relationships of the document: Id -> relationship attributes"""
+        if self._rels_dict is None:
+            self.load_relationships_data()
+        return self._rels_dict
+
     def get_relationship_target_by_id(self, relationship_id):
         """Returns target value for the reference from docx"""
         if self.rels_dict.get(relationship_id):
@@ -132,37 +300,160 @@ class DOCXDocument(object):
             return None
 
     def get_relationships_raw_data(self):
-        """Return raw Relationships data from docx file"""
-        return self._rels.read()
+        """
+        Return raw Relationships data from docx file.
+
+        Returns None if the document doesn't have relationships.
+        """
+        try:
+            return self.zip_file.read(DOCX_RELS_FILE_NAME)
+        except KeyError:
+            return None
 
     def load_relationships_data(self):
         """Load Relationships data into internal structure."""
-        self.rels_dict = {}
-
-        rel_soup = BeautifulSoup(self.get_relationships_raw_data(), 'lxml-xml')
-        for rel in rel_soup.find_all('Relationship'):
-            self.rels_dict[rel['Id']] = {
-                'Id': rel.get('Id'),
-                'Type': rel.get('Type'),
-                'Target': rel.get('Target'),
-                'TargetMode': rel.get('TargetMode'),
-            }
+        started = time.perf_counter()
+        rels_dict = {}
+
+        raw = self.get_relationships_raw_data()
+        if raw:
+            from lxml import etree
+
+            for rel in etree.fromstring(raw).iter(RELATIONSHIP_TAG):
+                rels_dict[rel.get('Id')] = {
+                    'Id': rel.get('Id'),
+                    'Type': rel.get('Type'),
+                    'Target': rel.get('Target'),
+                    'TargetMode': rel.get('TargetMode'),
+                }
+        self._rels_dict = rels_dict
+
+        self._metrics.add(
+            'load_relationships_data',
+            time.perf_counter() - started,
+            len(raw or b'')
+        )
 
     def load_document_data(self):
         """Load Document data into internal sturcture"""
-        raw = BeautifulSoup(self.get_document_raw_data(), 'lxml-xml')
+        if self.is_streaming():
+            # paragraphs will be read on demand
+            # by get_doc_paragraphs_iter()
+            return
+
+        from bs4 import BeautifulSoup
+        from .items import DOCXParagraph
+
+        started = time.perf_counter()
+
+        data = self.get_document_raw_data()
+        raw = BeautifulSoup(data, 'lxml-xml')
         self._docx_body = raw.find('w:body')
         if self._docx_body is None:
             raise ValueError('Couldn''t find <w:body> withing '
-                             'loaded docs document {}'.format(self.file_name))
+                             'loaded docs document {}'.format(
+                                 self.get_display_name()))
 
         self._docx_paragraph_iterator = self._docx_body.findChildren(
             DOCXParagraph.FULL_TAG_NAME,
             recursive=False
         )
 
+        self._metrics.add(
+            'load_document_data', time.perf_counter() - started, len(data)
+        )
+
+    def _iter_streamed_elements(self):
+        """
+        Yields <w:body> paragraphs as lxml elements one by one
+        using lxml.etree.iterparse.
+
+        Every body level element is cleared as soon as the consumer
+        has finished with it, so memory usage doesn't depend on
+        the document size. Time spent on reading document is
+        measured as `load_document_data` stage.
+        """
+        from lxml import etree
+
+        body = None
+        events = ('start', 'end')
+        parsing_time = 0.0
+        started = time.perf_counter()
+        try:
+            for event, elem in etree.iterparse(self._doc, events=events):
+                if event == 'start':
+                    if body is None and elem.tag == W_BODY_TAG:
+                        body = elem
+                    continue
+
+                # only direct <w:body> children are taken into account,
+                # nested elements are released together with their ancestor
+                if body is None or elem.getparent() is not body:
+                    continue
+
+                if elem.tag == W_PARAGRAPH_TAG:
+                    parsing_time += time.perf_counter() - started
+                    yield elem
+                    started = time.perf_counter()
+
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del body[0]
+        finally:
+            parsing_time += time.perf_counter() - started
+            self._metrics.add(
+                'load_document_data',
+                parsing_time,
+                self._zipfile.getinfo(DOCX_CONTENTS_FILE_NAME).file_size
+            )
+
+        if body is None:
+            raise ValueError('Couldn''t find <w:body> withing '
+                             'loaded docs document {}'.format(
+                                 self.get_display_name()))
+
+    def _iter_streamed_paragraphs(self):
+        """Yields <w:body> paragraphs as bs4 tags in streaming mode"""
+        from bs4 import BeautifulSoup
+        from lxml import etree
+        from .items import DOCXParagraph
+
+        for elem in self._iter_streamed_elements():
+            soup = BeautifulSoup(etree.tostring(elem), 'lxml-xml')
+            yield soup.find(DOCXParagraph.FULL_TAG_NAME)
 
     def get_doc_paragraphs_iter(self):
-        """Returns list of document paragraphs"""
-        #print('Document paragraph list length: %d' % len(self._docx_paragraph_iterator))
+        """
+        Returns list of document paragraphs.
+
+        In streaming mode returns iterator over document paragraphs.
+        """
+        if self.is_streaming():
+            return self._iter_streamed_paragraphs()
         return self._docx_paragraph_iterator
+
+    def get_doc_paragraph_records_iter(self):
+        """
+        Yields DOCXParagraphRecord for every document paragraph.
+
+        In streaming mode records are built directly from lxml elements.
+        Otherwise loaded document tree is released after the last record
+        or when the generator is closed.
+        """
+        from .records import DOCXParagraphRecord
+
+        if self.is_streaming():
+            for elem in self._iter_streamed_elements():
+                yield DOCXParagraphRecord.from_element(elem, docx=self)
+            return
+
+        from .items import DOCXParagraph
+
+        try:
+            for tag in self._docx_paragraph_iterator:
+                yield DOCXParagraphRecord.from_paragraph(
+                    DOCXParagraph(tag, docx=self, debug=self._debug)
+                )
+        finally:
+            self._docx_body = None
+            self._docx_paragraph_iterator = []
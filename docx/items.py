@@ -94,10 +94,8 @@ class DOCXItem(DOCXItemProto):
         """Returns True is debug mode is on, otherwise returns False"""
         return self._debug is True
 
-    def _getRawText(self) -> str:
-        """Returns unprocessed text from element"""
-
-        res = []
+    def _collectRawText(self, res: list) -> None:
+        """Appends unprocessed text fragments of element to `res` list"""
         for child in self.getChildren():
 
             docx_child = DOCXItem.factory(
@@ -106,7 +104,12 @@ class DOCXItem(DOCXItemProto):
                 debug=self.is_debug()
             )
             if docx_child:
-                res = res + docx_child.getRawText()
+                docx_child._collectRawText(res)
+
+    def _getRawText(self) -> list:
+        """Returns unprocessed text from element"""
+        res = []
+        self._collectRawText(res)
         return res
 
     def getText(self):
@@ -147,6 +150,12 @@ class DOCXParagraph(DOCXItem):
 
     _id = None
 
+    # text extraction results cache
+    _raw_text = None
+    _text = None
+    _cleaned_text = None
+    _run_count = 0
+
     def __init__(self, item, *args, **kwargs):
         super(DOCXParagraph, self).__init__(item, *args, **kwargs)
 
@@ -154,12 +163,62 @@ class DOCXParagraph(DOCXItem):
             if item.attrs.get('w14:paraId'):
                 self._id = item.attrs['w14:paraId']
 
+    def _extractText(self):
+        """
+        Extracts raw text fragments, text and cleaned text of paragraph.
+
+        Extraction is done once per paragraph, all subsequent calls
+        of getRawText(), getText() and getCleanedText() use cached values.
+        """
+        if self._raw_text is None:
+            self._raw_text = self._getRawText()
+            self._text = ''.join(self._raw_text)
+            self._cleaned_text = CLEANING_REGEXP.sub('', self._text)
+
+    def _collectRawText(self, res):
+        """Appends text fragments to `res` and counts paragraph runs"""
+        self._run_count = 0
+        for child in self.getChildren():
+            docx_child = DOCXItem.factory(
+                child,
+                docx=self.doc,
+                debug=self.is_debug()
+            )
+            if docx_child:
+                if isinstance(docx_child, (DOCXRun, DOCXHyperlink)):
+                    self._run_count += 1
+                docx_child._collectRawText(res)
+
+    def getRawText(self):
+        self._extractText()
+        return list(self._raw_text)
+
+    def getRunCount(self):
+        """Returns number of text runs (including hyperlinks)"""
+        self._extractText()
+        return self._run_count
+
+    def getText(self):
+        self._extractText()
+        return self._text
+
+    def getCleanedText(self):
+        self._extractText()
+        return self._cleaned_text
+
     def getImages(self):
         return self._item.findChildren(
             DOCXDrawing.FULL_TAG_NAME,
             recursive=True
         )
 
+    def getDrawings(self):
+        """Returns DOCXDrawing instances for all paragraph images"""
+        return [
+            DOCXDrawing(img, docx=self.doc, debug=self.is_debug())
+            for img in self.getImages()
+        ]
+
     def getId(self):
         return '' if self._id is None else self._id
 
@@ -175,6 +234,32 @@ class DOCXDrawing(DOCXItem):
     def getText(self):
         return None
 
+    def isPicture(self):
+        """
+        Checks if drawing is a picture.
+
+        Shapes, text boxes and charts have no <pic:blipFill>.
+        """
+        return self._item.find('pic:blipFill') is not None
+
+    def getImageRelationshipId(self):
+        """
+        Returns image relationship identifier.
+
+        From <w:drawing>/../<a:blip r:embed="referenceId">
+        """
+        blip_fill = self._item.find('pic:blipFill')
+        if blip_fill is None:
+            return None
+
+        embed_tag = blip_fill.find('a:blip')
+        # pic_tag = self._item.find('pic:cNvPr')
+        if embed_tag:
+            #  <a:blip r:embed="rId6"/>
+            return embed_tag.get('r:embed')
+
+        return None
+
     def getImageName(self):
         """
         Returns image name.
@@ -183,13 +268,9 @@ class DOCXDrawing(DOCXItem):
         referenceId will be replaced with target reference
         from relationships docx file.
         """
-        embed_tag = self._item.find('pic:blipFill').find('a:blip')
-        # pic_tag = self._item.find('pic:cNvPr')
-        if embed_tag:
-            #  <a:blip r:embed="rId6"/>
-            rId = embed_tag.get('r:embed')
-            if rId and self.doc:
-                return self.doc.get_relationship_target_by_id(rId)
+        rId = self.getImageRelationshipId()
+        if rId and self.doc:
+            return self.doc.get_relationship_target_by_id(rId)
 
         return None
 
@@ -204,7 +285,7 @@ class DOCXHyperlink(DOCXItem):
         """Returns relationship identifier."""
         return self._item.get('r:id')
 
-    def _getRawText(self):
+    def _collectRawText(self, res):
         href = None
         if self.doc:
             href = self.doc.get_relationship_target_by_id(
@@ -212,7 +293,7 @@ class DOCXHyperlink(DOCXItem):
             )
 
         text = DOCXRun(self._item.find(DOCXRun.FULL_TAG_NAME)).getText()
-        return ['<a href="{}">{}</a>'.format(href, text)]
+        res.append('<a href="{}">{}</a>'.format(href, text))
 
     def getCleanedText(self):
         return self._item.get_text()
@@ -234,17 +315,12 @@ class DOCXRun(DOCXItem):
     FULL_TAG_NAME = 'w:r'
     TAG_NAME = 'r'
 
-    def _getRawText(self):
-        res = []
-
+    def _collectRawText(self, res):
         tag_target_list = [DOCXText.FULL_TAG_NAME, DOCXBr.FULL_TAG_NAME]
         for item in self._item.findChildren(tag_target_list, recursive=False):
             el = DOCXItem.factory(item, docx=self.doc)
             if el:
-                txt = el.getRawText()
-                if txt:
-                    res = res + txt
-        return res
+                el._collectRawText(res)
 
     def getCleanedText(self):
         return self._item.get_text()
@@ -256,8 +332,8 @@ class DOCXText(DOCXItem):
     FULL_TAG_NAME = 'w:t'
     TAG_NAME = 't'
 
-    def _getRawText(self):
-        return [self._item.text]
+    def _collectRawText(self, res):
+        res.append(self._item.text)
 
 
 class DOCXBr(DOCXItem):
@@ -266,5 +342,5 @@ class DOCXBr(DOCXItem):
     FULL_TAG_NAME = 'w:br'
     TAG_NAME = 'br'
 
-    def _getRawText(self):
-        return [LINESEP]
+    def _collectRawText(self, res):
+        res.append(LINESEP)
@@ -0,0 +1,151 @@
+"""
+Module contains opt-in instrumentation for parsing stages:
+  * Metrics - collects wall time, calls count and processed bytes
+  * NullMetrics - does nothing, used when instrumentation is off
+  * ParagraphCosts - collects time spent on every paragraph
+  * NullParagraphCosts - does nothing, used when profiling is off
+"""
+import contextlib
+import time
+
+
+def merge_metrics(totals: dict, metrics: dict) -> dict:
+    """Adds `metrics` (Metrics.as_dict() result) to `totals` dict"""
+    for stage, values in metrics.items():
+        total = totals.setdefault(
+            stage, {'seconds': 0.0, 'calls': 0, 'bytes': 0}
+        )
+        for key in total:
+            total[key] += values.get(key, 0)
+    return totals
+
+
+def format_prometheus(totals: dict, prefix: str = 'asozd_parser') -> str:
+    """Returns metrics totals in Prometheus text exposition format"""
+    lines = []
+    for key, help_text in [('seconds', 'Wall time spent in the stage.'),
+                           ('calls', 'Number of stage calls.'),
+                           ('bytes', 'Number of bytes processed by stage.')]:
+        name = '{}_stage_{}_total'.format(prefix, key)
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} counter'.format(name))
+        for stage in sorted(totals):
+            lines.append('{}{{stage="{}"}} {}'.format(
+                name, stage, totals[stage][key]
+            ))
+    return '\n'.join(lines) + '\n'
+
+
+class NullMetrics(object):
+    """Metrics collector which doesn't collect anything"""
+
+    _context = contextlib.nullcontext()
+
+    def is_enabled(self):
+        return False
+
+    def timer(self, stage, nbytes=0):
+        return self._context
+
+    def add(self, stage, seconds, nbytes=0, calls=1):
+        pass
+
+    def as_dict(self):
+        return {}
+
+
+class Metrics(NullMetrics):
+    """Collector of wall time, calls count and processed bytes per stage"""
+
+    def __init__(self):
+        self._stages = {}
+
+    def is_enabled(self):
+        return True
+
+    @contextlib.contextmanager
+    def timer(self, stage, nbytes=0):
+        """Context manager measuring wall time of the stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started, nbytes)
+
+    def add(self, stage, seconds, nbytes=0, calls=1):
+        """Adds stage measurement"""
+        values = self._stages.setdefault(
+            stage, {'seconds': 0.0, 'calls': 0, 'bytes': 0}
+        )
+        values['seconds'] += seconds
+        values['calls'] += calls
+        values['bytes'] += nbytes
+
+    def as_dict(self):
+        """Returns collected values as dict: stage -> values"""
+        return {k: dict(v) for k, v in self._stages.items()}
+
+
+NULL_METRICS = NullMetrics()
+
+
+class NullParagraphCosts(object):
+    """Paragraph costs collector which doesn't collect anything"""
+
+    _context = contextlib.nullcontext()
+
+    def is_enabled(self):
+        return False
+
+    def timer(self, para, stage):
+        return self._context
+
+    def as_list(self):
+        return []
+
+
+class ParagraphCosts(NullParagraphCosts):
+    """
+    Collector of time spent on every paragraph by stages.
+
+    Paragraphs are identified with getId(), paragraph runs count
+    and text length are stored along with stage times.
+    """
+
+    def __init__(self):
+        self._paragraphs = []
+        self._last_para = None
+
+    def is_enabled(self):
+        return True
+
+    def _get_values(self, para):
+        if para is not self._last_para:
+            self._last_para = para
+            self._paragraphs.append({
+                'id': para.getId(),
+                'runs': para.getRunCount(),
+                'length': len(para.getText()),
+                'seconds': 0.0,
+            })
+        return self._paragraphs[-1]
+
+    @contextlib.contextmanager
+    def timer(self, para, stage):
+        """Context manager measuring wall time of the paragraph stage"""
+        values = self._get_values(para)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            key = stage + '_seconds'
+            values[key] = values.get(key, 0.0) + seconds
+            values['seconds'] += seconds
+
+    def as_list(self):
+        """Returns collected values in the document order"""
+        return [dict(x) for x in self._paragraphs]
+
+
+NULL_PARAGRAPH_COSTS = NullParagraphCosts()
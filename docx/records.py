@@ -0,0 +1,160 @@
+"""
+Module contains compact paragraph representation (DOCXParagraphRecord).
+
+Records keep only the data needed for parsing: paragraph identifier,
+flat list of text fragments and image relationship identifiers.
+They don't reference XML tree, so the tree could be released
+as soon as records are built.
+"""
+import logging
+
+from lxml import etree
+
+from .items import CLEANING_REGEXP, LINESEP, DOCXItem
+
+
+logger = logging.getLogger(__name__)
+
+W_NAMESPACE = r'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W14_NAMESPACE = r'http://schemas.microsoft.com/office/word/2010/wordml'
+R_NAMESPACE = (r'http://schemas.openxmlformats.org/'
+               r'officeDocument/2006/relationships')
+A_NAMESPACE = r'http://schemas.openxmlformats.org/drawingml/2006/main'
+PIC_NAMESPACE = r'http://schemas.openxmlformats.org/drawingml/2006/picture'
+
+W_RUN_TAG = '{%s}r' % W_NAMESPACE
+W_TEXT_TAG = '{%s}t' % W_NAMESPACE
+W_BR_TAG = '{%s}br' % W_NAMESPACE
+W_DRAWING_TAG = '{%s}drawing' % W_NAMESPACE
+W14_PARA_ID_ATTR = '{%s}paraId' % W14_NAMESPACE
+R_ID_ATTR = '{%s}id' % R_NAMESPACE
+R_EMBED_ATTR = '{%s}embed' % R_NAMESPACE
+PIC_BLIP_FILL_TAG = '{%s}blipFill' % PIC_NAMESPACE
+A_BLIP_TAG = '{%s}blip' % A_NAMESPACE
+
+
+class DOCXParagraphRecord(object):
+    """
+    Compact paragraph representation detached from XML tree.
+
+    Provides the same text routines as DOCXParagraph.
+    """
+
+    __slots__ = ('_id', '_raw_text', '_text', '_cleaned_text', '_image_ids',
+                 '_run_count')
+
+    def __init__(self, para_id, raw_text, image_ids=(), run_count=0):
+        self._id = para_id
+        self._raw_text = tuple(raw_text)
+        self._text = ''.join(self._raw_text)
+        self._cleaned_text = CLEANING_REGEXP.sub('', self._text)
+        self._image_ids = tuple(image_ids)
+        self._run_count = run_count
+
+    @classmethod
+    def from_paragraph(cls, para):
+        """Creates record from DOCXParagraph instance"""
+        return cls(
+            para.getId(),
+            para.getRawText(),
+            [drw.getImageRelationshipId() for drw in para.getDrawings()
+             if drw.isPicture()],
+            para.getRunCount()
+        )
+
+    @classmethod
+    def from_element(cls, elem, docx=None):
+        """
+        Creates record from lxml <w:p> element.
+
+        Follows the same rules as DOCXParagraph does for bs4 tags.
+        `docx` is used for resolving hyperlinks references.
+        """
+        raw_text = []
+        run_count = _collect_element_raw_text(elem, raw_text, docx)
+
+        image_ids = []
+        for drawing in elem.iter(W_DRAWING_TAG):
+            blip_fill = drawing.find('.//%s' % PIC_BLIP_FILL_TAG)
+            if blip_fill is None:
+                # shapes, text boxes and charts aren't images
+                continue
+            blip = blip_fill.find('.//%s' % A_BLIP_TAG)
+            image_ids.append(None if blip is None else blip.get(R_EMBED_ATTR))
+
+        return cls(
+            elem.get(W14_PARA_ID_ATTR) or '', raw_text, image_ids, run_count
+        )
+
+    def getId(self):
+        return self._id
+
+    def getRawText(self):
+        return list(self._raw_text)
+
+    def getText(self):
+        return self._text
+
+    def getCleanedText(self):
+        return self._cleaned_text
+
+    def getRunCount(self):
+        """Returns number of text runs (including hyperlinks)"""
+        return self._run_count
+
+    def getImageIds(self):
+        """Returns relationship identifiers of paragraph images"""
+        return list(self._image_ids)
+
+    def __repr__(self):
+        return '<{} {}: {!r}>'.format(
+            self.__class__.__name__, self._id, self._text
+        )
+
+
+def _collect_run_raw_text(elem, res):
+    """Appends <w:t> and <w:br> contents of <w:r> element to `res`"""
+    for child in elem:
+        if child.tag == W_TEXT_TAG:
+            res.append(child.text or '')
+        elif child.tag == W_BR_TAG:
+            res.append(LINESEP)
+
+
+def _collect_element_raw_text(elem, res, docx):
+    """
+    Appends text fragments of lxml element children to `res`.
+
+    Mirrors DOCXItem.factory() dispatching by element local name.
+    Returns number of runs (including hyperlinks) found.
+    """
+    run_count = 0
+    for child in elem:
+        if not isinstance(child.tag, str):
+            # comments and processing instructions
+            continue
+
+        name = etree.QName(child).localname
+        if name in DOCXItem.EXCLUDE_LIST:
+            continue
+
+        if name == 'r':
+            run_count += 1
+            _collect_run_raw_text(child, res)
+        elif name == 'hyperlink':
+            run_count += 1
+            href = None
+            if docx:
+                href = docx.get_relationship_target_by_id(child.get(R_ID_ATTR))
+            run = child.find('.//%s' % W_RUN_TAG)
+            text = []
+            if run is not None:
+                _collect_run_raw_text(run, text)
+            res.append('<a href="{}">{}</a>'.format(href, ''.join(text)))
+        elif name == 't':
+            res.append(child.text or '')
+        elif name == 'br':
+            res.append(LINESEP)
+        elif name in ('p', 'drawing'):
+            _collect_element_raw_text(child, res, docx)
+    return run_count
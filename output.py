@@ -0,0 +1,176 @@
+"""
+Definition of AggregateOutput class.
+Provides saving of all parsing results into a few aggregate files:
+  * JSON Lines file (optionally gzip or zstd compressed) with one
+    record per parsed document
+  * zip or tar archive with all images
+
+Files are valid only when closed: an interrupted gzip member or zstd
+frame is truncated and zip archive has no central directory. Marker
+file is kept while files are open, so files of a killed run aren't
+appended by the next one.
+"""
+import gzip
+import io
+import json
+import logging
+import os
+import tarfile
+import threading
+import time
+from zipfile import ZIP_STORED, ZipFile
+
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FILE_NAME = r'results.jsonl'
+IMAGES_ARCHIVE_FILE_NAME = r'images'
+# exists while aggregate files are open
+INCOMPLETE_MARKER_FILE_NAME = r'.aggregate_incomplete'
+
+COMPRESSION_EXTENSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+IMAGES_ARCHIVE_FORMATS = ['zip', 'tar']
+
+
+def _open_compressed_text(file_name: str,
+                          compression: str = None,
+                          append: bool = False):
+    """
+    Returns text file object writing with requested compression.
+
+    Appended data of compressed files is written as a new
+    gzip member or zstd frame.
+    """
+    mode = 'a' if append else 'w'
+    if compression is None:
+        return open(file_name, mode, encoding='utf-8')
+
+    if compression == 'gzip':
+        return gzip.open(file_name, mode + 't', encoding='utf-8')
+
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError(
+                "zstd compression requires 'zstandard' package installed"
+            )
+        raw = open(file_name, mode + 'b')
+        writer = zstandard.ZstdCompressor().stream_writer(raw)
+        return io.TextIOWrapper(writer, encoding='utf-8')
+
+    raise ValueError('Unsupported compression: {}'.format(compression))
+
+
+class AggregateOutput(object):
+    """
+    Writer of parsing results into aggregate files.
+
+    Accepts results exported by ASOZDParser.export_results().
+    Writing is thread safe, so one instance could be shared
+    by several writer threads.
+    """
+
+    def __init__(self,
+                 results_dir: str,
+                 compression: str = None,
+                 images_archive: str = 'zip'):
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError('Unsupported compression: {}'.format(compression))
+        if images_archive not in IMAGES_ARCHIVE_FORMATS:
+            raise ValueError(
+                'Unsupported images archive: {}'.format(images_archive)
+            )
+
+        self.results_file_name = os.path.join(
+            results_dir,
+            RESULTS_FILE_NAME + COMPRESSION_EXTENSIONS[compression]
+        )
+        self.images_file_name = os.path.join(
+            results_dir,
+            '{}.{}'.format(IMAGES_ARCHIVE_FILE_NAME, images_archive)
+        )
+        self.marker_file_name = os.path.join(
+            results_dir, INCOMPLETE_MARKER_FILE_NAME
+        )
+        self.compression = compression
+        self.images_archive = images_archive
+
+        self._results = None
+        self._images = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, res_type, value, traceback):
+        self.close()
+
+    def open(self, append: bool = False) -> None:
+        """
+        Creates destination files.
+
+        Results are added to existing files if `append` is True.
+        Raises ValueError if existing files weren't closed
+        by the previous run, they can't be appended.
+        """
+        os.makedirs(os.path.dirname(self.results_file_name), exist_ok=True)
+
+        if append and os.path.exists(self.marker_file_name):
+            raise ValueError((
+                "Aggregate files in '{}' weren't closed by the previous run "
+                "and can't be appended, start a new run instead"
+            ).format(os.path.dirname(self.results_file_name)))
+        with open(self.marker_file_name, 'w'):
+            pass
+
+        mode = 'a' if append else 'w'
+        self._results = _open_compressed_text(
+            self.results_file_name, self.compression, append
+        )
+        if self.images_archive == 'zip':
+            # images are compressed already
+            self._images = ZipFile(self.images_file_name, mode, ZIP_STORED)
+        else:
+            self._images = tarfile.open(self.images_file_name, mode)
+
+    def close(self) -> None:
+        """Flushes and closes destination files"""
+        if self._results:
+            self._results.close()
+            self._results = None
+        if self._images:
+            self._images.close()
+            self._images = None
+            # files are complete now
+            os.remove(self.marker_file_name)
+
+    def _add_image(self, name: str, data: bytes) -> None:
+        if self.images_archive == 'zip':
+            self._images.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._images.addfile(info, io.BytesIO(data))
+
+    def write(self, exported: dict) -> list:
+        """
+        Writes one document results and its images.
+
+        Returns list of files the results were written to.
+        """
+        line = json.dumps(exported['results'], ensure_ascii=False) + '\n'
+
+        with self._lock:
+            self._results.write(line)
+            for image_file_name, image_data in exported['images']:
+                # archive member names are always posix paths
+                self._add_image(
+                    image_file_name.replace(os.sep, '/'), image_data
+                )
+
+        if exported['images']:
+            return [self.results_file_name, self.images_file_name]
+        return [self.results_file_name]
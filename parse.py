@@ -1,11 +1,18 @@
+import contextlib
+import json
 import logging
 import os
 import re
+import signal
 import traceback
 
-from asozd import ASOZDParser
-
-from clize import run
+# heavy modules (bs4, lxml, asyncio, multiprocessing, compression
+# and clize) are imported on demand to keep CLI startup fast
+from asozd import ASOZDParser, BASE_DIR, OUT_DIR
+from compiled_config import get_default_config
+from docx.metrics import Metrics, format_prometheus, merge_metrics
+from parse_cache import ParseCache
+from parse_journal import ParseJournal
 
 
 logger = logging.getLogger(__name__)
@@ -14,22 +21,92 @@ logging.getLogger().setLevel(logging.INFO)  # default level is INFO
 
 DEBUG = False
 
+# number of files queued per worker process ahead of results
+# collection (see parse_files)
+PENDING_FILES_PER_WORKER = 4
+
+# only files with these extensions are passed to the predicate
+# by directory discovery (see filter_filenames)
+SOURCE_EXTENSIONS = ('.docx',)
+
+# file names of dead and left out persons
+SKIP_LEFT_OUT_RE = re.compile(r"(ВЫБЫЛ(А)?|УМЕР(ЛА)?|СДАЛ)")
+# file names of technical documents
+SKIP_TECHNICAL_RE = re.compile(r"^Вопросы")
+
 
 def parse_file(file_name: str,
                dest_dir: str = None,
-               dest_file_name: str = None) -> None:
+               dest_file_name: str = None,
+               streaming: bool = False,
+               metrics: bool = False,
+               export: bool = False,
+               dedup_images: bool = False,
+               validation_rules=None,
+               profile: bool = False,
+               shared_memory: bool = False) -> dict:
+    """
+    Parses docx file and saves results.
+
+    Any parsing error is logged and doesn't break the caller.
+    Returns parsing outcome as dict with 'file_name', 'ok',
+    'error', 'outputs' (list of saved files) and 'metrics'
+    (parsing stages metrics if requested) keys.
+
+    If `export` is True results aren't saved, but returned
+    as 'exported' key (see ASOZDParser.export_results), large images
+    of exported results are put into shared memory if `shared_memory`
+    is True (see shared_results).
+    Results are checked with `validation_rules`
+    (validate.ValidationRules) if passed, found issues are
+    returned as 'issues' key. Paragraphs loading is profiled if
+    `profile` is True, profile is returned as 'profile' key
+    (see profiling.Profiler.as_dict).
+    """
     logger.info('Looking {} file for valuable content.'.format(file_name))
+    outcome = {
+        'file_name': file_name, 'ok': False, 'error': None, 'outputs': []
+    }
+    file_metrics = Metrics() if metrics else None
+    profiler = None
+    if profile:
+        from profiling import Profiler
+
+        profiler = Profiler()
 
     try:
         # parser init
-        P = ASOZDParser(file_name, debug=DEBUG)
-        # parse
-        P.load_paragraphs()
-        # storing parsed results
-        P.save_all_results(
-            results_dir=dest_dir,
-            results_file_name=dest_file_name
-        )
+        with ASOZDParser(file_name,
+                         debug=DEBUG,
+                         streaming=streaming,
+                         metrics=file_metrics,
+                         paragraph_costs=profiler and
+                         profiler.paragraph_costs) as P:
+            # parse
+            with profiler or contextlib.nullcontext():
+                P.load_paragraphs()
+            if validation_rules is not None:
+                from validate import validate_results
+
+                outcome['issues'] = validate_results(
+                    P.get_results_for_save(), validation_rules
+                )
+            # storing parsed results
+            if export:
+                outcome['exported'] = P.export_results(
+                    results_file_name=dest_file_name
+                )
+                if shared_memory:
+                    from shared_results import share_exported
+
+                    outcome['exported'] = share_exported(outcome['exported'])
+            else:
+                outcome['outputs'] = P.save_all_results(
+                    results_dir=dest_dir,
+                    results_file_name=dest_file_name,
+                    dedup_images=dedup_images
+                )
+        outcome['ok'] = True
     except KeyboardInterrupt:
         raise
     except:
@@ -38,39 +115,318 @@ def parse_file(file_name: str,
         logging.error("Error occurred during parsing file: %s" % file_name)
         logging.error(traceback.format_exc())
         logging.error('='*50)
+        outcome['error'] = traceback.format_exc(limit=0).strip()
+
+    if file_metrics:
+        outcome['metrics'] = file_metrics.as_dict()
+    if profiler:
+        outcome['profile'] = profiler.as_dict()
+
+    return outcome
+
+
+def parse_files(file_names,
+                dest_dir: str = None,
+                workers: int = 1,
+                streaming: bool = False,
+                metrics: bool = False,
+                sink=None,
+                dedup_images: bool = False,
+                on_outcome=None,
+                validation_rules=None,
+                profile: bool = False,
+                shared_memory: bool = True) -> list:
+    """
+    Parses every file from `file_names` iterable.
+
+    Files are sent to a pool of `workers` processes if `workers`
+    is greater than 1, otherwise they are parsed one by one.
+    Pool gets PENDING_FILES_PER_WORKER files per worker at most, so
+    outcomes of done files are stored while `file_names` is consumed.
+    Results are written to `sink` (output.AggregateOutput) if passed,
+    otherwise every file results are saved separately (identical images
+    are stored once if `dedup_images` is True). Large images written
+    to `sink` are passed from workers through shared memory if
+    `shared_memory` is True. Results are checked
+    with `validation_rules` if passed and profiled if `profile`
+    is True (see parse_file).
+    `on_outcome` callback is called with every outcome as soon as
+    the file is done. Returns list of parsing outcomes (see parse_file).
+    """
+    outcomes = []
+    export = sink is not None
+
+    def store(outcome):
+        if 'exported' in outcome:
+            from shared_results import attach_exported
+
+            with attach_exported(outcome.pop('exported')) as exported:
+                outcome['outputs'] = sink.write(exported)
+        outcomes.append(outcome)
+        if on_outcome:
+            on_outcome(outcome)
+
+    if workers <= 1:
+        for file_name in file_names:
+            logger.info(
+                '  >>>...>>>...>>>... Start processing file: %s', file_name
+            )
+            store(parse_file(
+                file_name, dest_dir,
+                streaming=streaming, metrics=metrics, export=export,
+                dedup_images=dedup_images, validation_rules=validation_rules,
+                profile=profile
+            ))
+        return outcomes
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    if export and shared_memory:
+        from shared_results import start_channel
+
+        shared_memory = start_channel()
+
+    def collect(future):
+        file_name = pending.pop(future)
+        try:
+            outcome = future.result()
+        except Exception:
+            # parse_file isolates parsing errors by itself, so we
+            # could get here only if worker process has died
+            logger.exception('Worker failed on file: %s', file_name)
+            outcome = {
+                'file_name': file_name,
+                'ok': False,
+                'error': traceback.format_exc(limit=0).strip(),
+                'outputs': []
+            }
+        store(outcome)
+
+    def collect_done(block):
+        done, _ = wait(pending, timeout=None if block else 0,
+                       return_when=FIRST_COMPLETED)
+        for future in done:
+            collect(future)
+
+    # files are queued in portions, so outcomes are stored (and
+    # journaled) while the rest of files are still being discovered
+    max_pending = workers * PENDING_FILES_PER_WORKER
+    pending = {}
+
+    logger.info('Starting pool of %d worker processes', workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for file_name in file_names:
+                if pending:
+                    collect_done(block=len(pending) >= max_pending)
+                logger.info(
+                    '  >>>...>>>...>>>... Queueing file: %s', file_name
+                )
+                future = executor.submit(
+                    parse_file, file_name, dest_dir,
+                    streaming=streaming, metrics=metrics, export=export,
+                    dedup_images=dedup_images,
+                    validation_rules=validation_rules,
+                    profile=profile, shared_memory=export and shared_memory
+                )
+                pending[future] = file_name
+
+            while pending:
+                collect_done(block=True)
+        except BaseException as e:
+            # outcomes of queued files are stored before the error is
+            # raised, only files not started yet are dropped on interruption
+            if isinstance(e, KeyboardInterrupt):
+                for future in list(pending):
+                    if future.cancel():
+                        del pending[future]
+            while pending:
+                collect_done(block=True)
+            raise
+
+    return outcomes
+
+
+def log_summary(outcomes: list) -> None:
+    """Writes summary of parsing successes and failures to the log."""
+    failed = [x for x in outcomes if not x['ok']]
+
+    logger.info('='*50)
+    logger.info(
+        'Parsed files: %d, succeeded: %d, failed: %d',
+        len(outcomes), len(outcomes) - len(failed), len(failed)
+    )
+    for outcome in failed:
+        logger.info('  FAILED %s: %s', outcome['file_name'], outcome['error'])
+    logger.info('='*50)
+
+
+def dump_metrics(outcomes: list,
+                 file_name: str,
+                 metrics_format: str = 'json') -> None:
+    """
+    Writes parsing stages metrics of all files to `file_name`.
 
+    `metrics_format` is 'json' (totals and per file values)
+    or 'prometheus' (totals in Prometheus text format).
+    """
+    totals = {}
+    for outcome in outcomes:
+        merge_metrics(totals, outcome.get('metrics') or {})
+
+    if metrics_format == 'prometheus':
+        failed = len([x for x in outcomes if not x['ok']])
+        content = format_prometheus(totals) + (
+            '# HELP asozd_parser_files_total Number of parsed files.\n'
+            '# TYPE asozd_parser_files_total counter\n'
+            'asozd_parser_files_total{{status="ok"}} {}\n'
+            'asozd_parser_files_total{{status="failed"}} {}\n'
+        ).format(len(outcomes) - failed, failed)
+    elif metrics_format == 'json':
+        content = json.dumps({
+            'totals': totals,
+            'files': {
+                x['file_name']: x.get('metrics') or {} for x in outcomes
+            },
+        }, ensure_ascii=False, indent=2)
+    else:
+        raise ValueError(
+            'Unsupported metrics format: {}'.format(metrics_format)
+        )
+
+    with open(file_name, 'w', encoding='utf-8') as f:
+        f.write(content)
+    logger.info('Metrics saved to %s', file_name)
+
+
+def dump_validation_report(outcomes: list,
+                           results_dir: str,
+                           file_name: str) -> None:
+    """Writes issues found by inline validation to `file_name`"""
+    from validate import dump_report, make_report
+
+    checked = [x for x in outcomes if x['ok']]
+    issues = {x['file_name']: x['issues'] for x in checked if x.get('issues')}
+    for name in issues:
+        logger.warning('Validation issues in %s', name)
+
+    dump_report(make_report(results_dir, len(checked), issues), file_name)
 
-def filter_filenames(dirpath, predicate):
+
+def _scan_dir(dirpath, predicate, extensions, stop=None):
+    """
+    Yields files within the directory tree fit for `predicate`.
+
+    Files are checked by extension before `predicate` is called.
+    Scanning is stopped as soon as `stop` event is set.
+    """
+    dirs = [dirpath]
+    while dirs and not (stop and stop.is_set()):
+        try:
+            entries = os.scandir(dirs.pop())
+        except OSError as e:
+            logger.warning('Couldn\'t scan directory: %s', e)
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                        continue
+                except OSError:
+                    continue
+                if extensions and not entry.name.lower().endswith(extensions):
+                    continue
+                if predicate(entry.path):
+                    yield entry.path
+
+
+def filter_filenames(dirpath, predicate,
+                     extensions=SOURCE_EXTENSIONS,
+                     workers: int = 1):
     """Usage:
 
            >>> for filename in filter_filenames('/', re.compile(r'/home.*\.bak').match):
            ....    # do something
+
+    Only files with `extensions` are passed to `predicate` (any files
+    if `extensions` is empty). Top level subdirectories are scanned
+    by `workers` threads if `workers` is greater than 1. Files are
+    yielded as soon as they are found.
     """
-    for dir_, dirnames, filenames in os.walk(dirpath):
-        for filename in filenames:
-            abspath = os.path.join(dir_, filename)
-            if predicate(abspath):
-                yield abspath
+    extensions = tuple(x.lower() for x in extensions or ())
+
+    if workers <= 1:
+        yield from _scan_dir(dirpath, predicate, extensions)
+        return
+
+    import queue
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    found = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def scan(path):
+        try:
+            for file_name in _scan_dir(path, predicate, extensions, stop):
+                found.put(file_name)
+        finally:
+            found.put(done)
+
+    top_dirs = []
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                top_dirs.append(entry.path)
+            elif (not extensions or
+                  entry.name.lower().endswith(extensions)) and \
+                    predicate(entry.path):
+                yield entry.path
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for path in top_dirs:
+            executor.submit(scan, path)
+        pending = len(top_dirs)
+        while pending:
+            file_name = found.get()
+            if file_name is done:
+                pending -= 1
+            else:
+                yield file_name
+    finally:
+        # consumer could stop early (interruption)
+        stop.set()
+        executor.shutdown()
 
 
 def is_filename_fit(file_name: str) -> bool:
+    """
+    Returns True if the docx file has to be parsed.
+
+    Only base name of the file is checked, so parent
+    directories names don't matter.
+    """
+    base_name = os.path.basename(file_name)
     result = True
 
-    if not file_name.endswith('.docx') or file_name.startswith('~$'):
+    if not base_name.endswith('.docx') or base_name.startswith('~$'):
         logger.info(
             'Skipping {} as non supportable file.'.format(file_name)
         )
         result = False
 
     # skip dead and left out
-    if re.search(r"(ВЫБЫЛ(А)?|УМЕР(ЛА)?|СДАЛ)", file_name):
+    if SKIP_LEFT_OUT_RE.search(base_name):
         logger.info(
             'Skipping {} as left out or dead person.'.format(file_name)
         )
         result = False
 
     # skip technical files
-    if re.search(r"^Вопросы", file_name):
+    if SKIP_TECHNICAL_RE.search(base_name):
         logger.info('Skipping {} as technical document.'.format(file_name))
         result = False
 
@@ -81,6 +437,22 @@ def parser(source: str,
            *,
            source_mask: str = None,
            destination: str = None,
+           streaming: bool = False,
+           workers: int = 1,
+           force: bool = False,
+           pipeline: bool = False,
+           read_concurrency: int = 4,
+           write_concurrency: int = 4,
+           metrics: str = None,
+           metrics_format: str = 'json',
+           output_format: str = 'json',
+           compression: str = None,
+           images_archive: str = 'zip',
+           dedup_images: bool = False,
+           resume: bool = False,
+           validate: str = None,
+           profile: str = None,
+           scan_workers: int = 1,
            verbose: bool = False) -> None:
     """
     Convert specific structured Open Office XML files into json.
@@ -92,11 +464,44 @@ def parser(source: str,
     :param destination: Destination directory ('out' used by default)
     :param json_file: Destination file name (without extension).
                       Works only if file_name references to file
+    :param streaming: Read document paragraphs one by one instead of
+                      loading the whole document tree into memory
+    :param workers: Number of worker processes used for parsing files
+                    if `source` is a directory
+    :param force: Parse all files ignoring results of previous runs
+    :param pipeline: Overlap reading, parsing (`workers` processes)
+                     and writing of files with asyncio pipeline
+    :param read_concurrency: Number of files read at once in pipeline mode
+    :param write_concurrency: Number of results written at once
+                              in pipeline mode
+    :param metrics: File name for saving parsing stages metrics
+                    (wall time, calls and bytes processed)
+    :param metrics_format: Metrics file format: 'json' or 'prometheus'
+    :param output_format: 'json' (json file per document) or 'jsonl'
+                          (all documents in one JSON Lines file and all
+                          images in one archive)
+    :param compression: JSON Lines file compression: 'gzip' or 'zstd'
+    :param images_archive: Images archive format for 'jsonl' output:
+                           'zip' or 'tar'
+    :param dedup_images: Store identical images once and hard link them
+                         to the destination files
+    :param resume: Skip files successfully parsed by the previous
+                   (interrupted) run according to its journal
+    :param validate: File name for report of results validation
+                     (see validate.py) done right after parsing
+    :param profile: File name for cProfile stats of paragraphs loading,
+                    ranked report of the most expensive files and
+                    paragraphs is saved as json file with the same name
+    :param scan_workers: Number of threads scanning top level
+                         subdirectories of `source` directory
     :param verbose: Increase output verbosity
     """
     if verbose:
         logging.getLogger().setLevel(logging.DEBUG)
 
+    # invalid config is reported before parsing of any file
+    get_default_config()
+
     abs_source = os.path.abspath(source)
     logger.info('Passed %s as a source file/dir name', abs_source)
 
@@ -130,9 +535,9 @@ def parser(source: str,
             predicate = is_filename_fit
 
         logger.debug('source_dir=[%s]; predicate=[%s]', source_dir, str(predicate))
-        for docx_item in filter_filenames(source_dir, predicate):
-            logger.info('  >>>...>>>...>>>... Start processing file: %s', docx_item)
-            parse_file(docx_item, destination)
+        file_names = filter_filenames(
+            source_dir, predicate, workers=scan_workers
+        )
 
     else:
         # -------------------------------------------------
@@ -141,9 +546,126 @@ def parser(source: str,
         logger.info('File detected: %s', abs_source)
 
         file_name = os.path.basename(abs_source)
-        if is_filename_fit(file_name):
-            parse_file(abs_source, destination)
+        file_names = [abs_source] if is_filename_fit(file_name) else []
+
+    results_dir = destination or os.path.join(BASE_DIR, OUT_DIR)
+
+    if output_format == 'jsonl':
+        from output import AggregateOutput
+
+        sink = AggregateOutput(
+            results_dir,
+            compression=compression,
+            images_archive=images_archive
+        )
+    elif output_format == 'json':
+        sink = None
+    else:
+        raise ValueError(f"Unsupported output format: '{output_format}'")
+
+    # results of previous runs are reused for unchanged files
+    cache = ParseCache(results_dir)
+    if force:
+        logger.info('Parameter `force` passed, cache is ignored')
+    elif sink:
+        # aggregate files are rewritten by every run
+        logger.info('Cache is not used for `jsonl` output format')
+    else:
+        cache.load()
+        file_names = cache.filter_outdated(file_names)
+
+    # aggregate files of a killed run can't be appended,
+    # so they're checked before anything else is touched
+    if sink:
+        sink.open(append=resume)
+
+    # completed files are journaled one by one, so interrupted run
+    # could be resumed
+    journal = ParseJournal(results_dir)
+    if resume:
+        journal.load()
+        file_names = journal.filter_done(file_names)
+    journal.open(append=resume)
+
+    validation_rules = None
+    if validate:
+        from validate import DEFAULT_RULES
+
+        validation_rules = DEFAULT_RULES
+
+    def on_outcome(outcome):
+        journal.record(outcome)
+        if sink:
+            return
+        if outcome['ok']:
+            cache.update(outcome['file_name'], outcome['outputs'])
+        else:
+            cache.remove(outcome['file_name'])
+
+    # SIGTERM is handled as Ctrl+C, so journal, cache and aggregate
+    # files are flushed before exit
+    previous_handler = signal.signal(
+        signal.SIGTERM, signal.default_int_handler
+    )
+    try:
+        if pipeline:
+            from pipeline import run_pipeline
+
+            outcomes = run_pipeline(
+                file_names,
+                destination,
+                read_concurrency=read_concurrency,
+                parse_concurrency=workers,
+                write_concurrency=write_concurrency,
+                streaming=streaming,
+                metrics=bool(metrics),
+                sink=sink,
+                dedup_images=dedup_images,
+                on_outcome=on_outcome,
+                validation_rules=validation_rules,
+                profile=bool(profile)
+            )
+        else:
+            outcomes = parse_files(
+                file_names,
+                destination,
+                workers=workers,
+                streaming=streaming,
+                metrics=bool(metrics),
+                sink=sink,
+                dedup_images=dedup_images,
+                on_outcome=on_outcome,
+                validation_rules=validation_rules,
+                profile=bool(profile)
+            )
+    except KeyboardInterrupt:
+        logger.warning(
+            'Parsing interrupted, run with `--resume` to continue'
+        )
+        raise SystemExit(130)
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        if sink:
+            sink.close()
+        else:
+            cache.save()
+        journal.close()
+
+    log_summary(outcomes)
+
+    if metrics:
+        dump_metrics(outcomes, metrics, metrics_format)
+
+    if validate:
+        dump_validation_report(outcomes, results_dir, validate)
+
+    if profile:
+        from profiling import dump_profile
+
+        dump_profile(outcomes, profile)
 
 
 if __name__ == '__main__':
+    from clize import run
+
     run(parser)
@@ -0,0 +1,135 @@
+"""
+Definition of ParseCache class.
+Provides persistent cache of docx parsing results.
+
+Cache manifest is stored as json file within destination directory and
+maps source file path to its size, mtime, SHA-256 hash, parser version
+and list of produced output files (json and images).
+"""
+import hashlib
+import json
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = r'.parse_cache.json'
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def get_file_hash(file_name: str) -> str:
+    """Returns SHA-256 hex digest of the file content"""
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_parser_version() -> str:
+    """
+    Returns version of parser and its configuration.
+
+    Any change of `parser_config.config` leads up to the new version,
+    so all cached results become invalid automatically.
+    """
+    from asozd import PARSER_VERSION
+    from parser_config import config
+
+    config_str = json.dumps(config, ensure_ascii=False, sort_keys=True)
+    config_hash = hashlib.sha256(config_str.encode('utf-8')).hexdigest()
+    return '{}-{}'.format(PARSER_VERSION, config_hash)
+
+
+class ParseCache(object):
+    """Persistent cache of parsing results keyed by source file content"""
+
+    def __init__(self, results_dir: str, version: str = None):
+        self.manifest_path = os.path.join(results_dir, MANIFEST_FILE_NAME)
+        self.version = version if version else get_parser_version()
+        self._entries = {}
+        self._is_changed = False
+
+    def load(self) -> None:
+        """Loads manifest from the destination directory"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        except ValueError:
+            logger.warning(
+                'Cache manifest %s is corrupted and will be rebuilt',
+                self.manifest_path
+            )
+            entries = {}
+
+        # entries made by another parser or config version are useless
+        self._entries = {
+            k: v for k, v in entries.items()
+            if v.get('version') == self.version
+        }
+        self._is_changed = len(self._entries) != len(entries)
+
+    def save(self) -> None:
+        """Atomically saves manifest to the destination directory"""
+        if not self._is_changed:
+            return
+
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+        self._is_changed = False
+
+    def is_valid(self, file_name: str) -> bool:
+        """Returns True if cached results of the file are still valid"""
+        entry = self._entries.get(os.path.abspath(file_name))
+        if not entry:
+            return False
+
+        if not all(os.path.isfile(x) for x in entry['outputs']):
+            return False
+
+        stat = os.stat(file_name)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+
+        # file was touched, so comparing its content
+        if get_file_hash(file_name) != entry['sha256']:
+            return False
+
+        entry['mtime_ns'] = stat.st_mtime_ns
+        self._is_changed = True
+        return True
+
+    def update(self, file_name: str, outputs: list) -> None:
+        """Stores output files produced for the source file"""
+        stat = os.stat(file_name)
+        self._entries[os.path.abspath(file_name)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': get_file_hash(file_name),
+            'version': self.version,
+            'outputs': [os.path.abspath(x) for x in outputs],
+        }
+        self._is_changed = True
+
+    def remove(self, file_name: str) -> None:
+        """Removes the source file from the cache"""
+        if self._entries.pop(os.path.abspath(file_name), None):
+            self._is_changed = True
+
+    def filter_outdated(self, file_names):
+        """Yields only files without valid cached results"""
+        for file_name in file_names:
+            if self.is_valid(file_name):
+                logger.info('Skipping %s as already parsed.', file_name)
+            else:
+                yield file_name
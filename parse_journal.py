@@ -0,0 +1,128 @@
+"""
+Definition of ParseJournal class.
+Provides append-only journal of files processed by a batch run.
+
+Journal is stored as JSON Lines file within destination directory,
+every line is an outcome of one file (see parse.parse_file) written
+as soon as the file is done. Interrupted run could be resumed by
+skipping files successfully parsed according to the journal.
+"""
+import json
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE_NAME = r'.parse_journal.jsonl'
+
+# outcome keys stored in the journal
+JOURNAL_KEYS = ['file_name', 'ok', 'error', 'outputs']
+
+# size of blocks the journal is read backwards by
+# when looking for the end of the last complete line
+READ_BLOCK_SIZE = 4096
+
+
+def _truncate_partial_line(file_name: str) -> None:
+    """Removes the last line of the file if it isn't terminated"""
+    try:
+        f = open(file_name, 'r+b')
+    except FileNotFoundError:
+        return
+
+    with f:
+        end = pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            start = max(pos - READ_BLOCK_SIZE, 0)
+            f.seek(start)
+            idx = f.read(pos - start).rfind(b'\n')
+            if idx >= 0:
+                pos = start + idx + 1
+                break
+            pos = start
+
+        if pos < end:
+            logger.warning('Removing partial last line of journal %s',
+                           file_name)
+            f.truncate(pos)
+
+
+class ParseJournal(object):
+    """Append-only journal of processed files"""
+
+    def __init__(self, results_dir: str):
+        self.journal_path = os.path.join(results_dir, JOURNAL_FILE_NAME)
+        self._outcomes = {}
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, res_type, value, traceback):
+        self.close()
+
+    def load(self) -> None:
+        """Loads outcomes of the previous run from the journal"""
+        self._outcomes = {}
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    try:
+                        outcome = json.loads(line)
+                    except ValueError:
+                        # the last line could be cut by the crash
+                        logger.warning(
+                            'Skipping broken line %d of journal %s',
+                            line_no, self.journal_path
+                        )
+                        continue
+                    self._outcomes[outcome['file_name']] = outcome
+        except FileNotFoundError:
+            pass
+
+    def open(self, append: bool = False) -> None:
+        """
+        Opens the journal for writing.
+
+        Journal of the previous run is kept if `append` is True,
+        otherwise new journal is started.
+        """
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        if append:
+            # new lines mustn't be glued to the line cut by the crash
+            _truncate_partial_line(self.journal_path)
+        self._file = open(
+            self.journal_path, 'a' if append else 'w', encoding='utf-8'
+        )
+
+    def close(self) -> None:
+        """Flushes the journal to disk and closes it"""
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def record(self, outcome: dict) -> None:
+        """Appends outcome of the file to the journal"""
+        entry = {k: outcome.get(k) for k in JOURNAL_KEYS}
+        entry['file_name'] = os.path.abspath(outcome['file_name'])
+
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        # line has to survive the crash of the process
+        self._file.flush()
+        self._outcomes[entry['file_name']] = entry
+
+    def is_done(self, file_name: str) -> bool:
+        """Returns True if the file was successfully parsed"""
+        outcome = self._outcomes.get(os.path.abspath(file_name))
+        return bool(outcome and outcome['ok'])
+
+    def filter_done(self, file_names):
+        """Yields only files not parsed successfully yet"""
+        for file_name in file_names:
+            if self.is_done(file_name):
+                logger.info('Skipping %s as done by previous run.', file_name)
+            else:
+                yield file_name
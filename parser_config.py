@@ -55,11 +55,21 @@ config = {
         'family': {
             'order_id': 8,
             'name': 'family',
-            'text_re': r'(<a[^>]+>)?([А-Яа-яё\s]+)?(Женат|женат|замужем|Замужем).*?(?<!г)(\.|$)', # regexp for retrieving extra content 
+            # words before the keyword are matched from the start of the
+            # words run only (lookbehind), so search doesn't retry every
+            # position of long runs and takes linear time
+            'text_re': r'(<a[^<>]+>)?(?<![А-Яа-яё\s])([А-Яа-яё\s]+)?(Женат|женат|замужем|Замужем).*?(?<!г)(\.|$)', # regexp for retrieving extra content 
                                                                              # data from  paragraph text
             'leave_also_contains_data': True, # don't touch data matched to text_re within original text,
                                               # otherwise data will be cropped
             'remove_links': True,
+            # text_re is searched only within texts containing any of
+            # these literals (text_re can't match without them), long
+            # paragraphs without a match backtrack heavily otherwise
+            'text_re_keywords': ['Женат', 'женат', 'замужем', 'Замужем'],
+            # optional text_re search time limit in seconds
+            # (requires 'regex' package):
+            # 'text_re_timeout': 0.5,
 
             # Examples:
             # Депутат женат с 2013 г., имеет дочь.
@@ -79,6 +89,20 @@ config = {
             'list_of_strings': True, # export as list of strings,
                                      # otherwise content data will be exported like one string
             'remove_empty_items': True,
+            # Optional normalization of list_of_strings items (switched off
+            # by default, applied in this order after the parsing):
+            # 'strip_items': True,          # strip leading and trailing spaces
+            # 'collapse_whitespace': True,  # replace whitespace sequences with
+            #                               # single space (stripping items too)
+            # 'dedupe_items': True,         # remove repeated items
+            # Optional early termination settings (available for every type,
+            # switched off by default):
+            # 'max_paragraphs': 50,  # section is closed after this number of
+            #                        # paragraphs (including the title one), the
+            #                        # rest of not recognized paragraphs are skipped
+            # 'stop_parsing_when_closed': True,  # stop reading the document when
+            #                                    # the section is closed by the next
+            #                                    # section or by 'max_paragraphs'
         }
     }
 }
\ No newline at end of file
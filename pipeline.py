@@ -0,0 +1,285 @@
+"""
+Asyncio pipeline for parsing docx files.
+
+Every file passes three stages connected with bounded queues:
+  * read  - loading docx file content (thread pool)
+  * parse - parsing docx content (process pool)
+  * write - saving json and images results (thread pool)
+
+Stages run concurrently, so storage latency of reading and
+writing overlaps with CPU work of parsing.
+"""
+import asyncio
+import logging
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+DEBUG = False
+
+
+def read_data(file_name: str) -> bytes:
+    """Returns docx file content"""
+    with open(file_name, 'rb') as f:
+        return f.read()
+
+
+def parse_data(data: bytes,
+               streaming: bool = False,
+               metrics: bool = False,
+               validation_rules=None,
+               profile: bool = False,
+               shared_memory: bool = False) -> dict:
+    """
+    Parses docx content and returns exported results.
+
+    Parsing stages metrics are added as 'metrics' key if requested.
+    Issues found with `validation_rules` (validate.ValidationRules)
+    are added as 'issues' key if rules are passed. Profile of
+    paragraphs loading is added as 'profile' key if requested.
+    Large images are put into shared memory if `shared_memory` is True
+    (see shared_results).
+    """
+    import contextlib
+
+    from asozd import ASOZDParser
+    from docx.metrics import Metrics
+
+    profiler = None
+    if profile:
+        from profiling import Profiler
+
+        profiler = Profiler()
+
+    with ASOZDParser(data,
+                     debug=DEBUG,
+                     streaming=streaming,
+                     metrics=Metrics() if metrics else None,
+                     paragraph_costs=profiler and
+                     profiler.paragraph_costs) as P:
+        with profiler or contextlib.nullcontext():
+            P.load_paragraphs()
+        exported = P.export_results()
+        exported['metrics'] = P.get_metrics().as_dict()
+        if profiler:
+            exported['profile'] = profiler.as_dict()
+        if validation_rules is not None:
+            from validate import validate_results
+
+            exported['issues'] = validate_results(
+                exported['results'], validation_rules
+            )
+    if shared_memory:
+        from shared_results import share_exported
+
+        exported = share_exported(exported)
+    return exported
+
+
+def write_data(exported: dict,
+               dest_dir: str = None,
+               sink=None,
+               dedup_images: bool = False) -> list:
+    """
+    Saves exported results and returns list of saved files.
+
+    Results are written to `sink` (output.AggregateOutput) if passed.
+    Images passed through shared memory are released after writing.
+    """
+    from asozd import save_exported_results
+    from shared_results import attach_exported
+
+    with attach_exported(exported) as exported:
+        if sink is not None:
+            return sink.write(exported)
+        return save_exported_results(
+            exported, results_dir=dest_dir, dedup_images=dedup_images
+        )
+
+
+def _failed_outcome(file_name: str, stage: str) -> dict:
+    logger.error('Error occurred during %s stage of file: %s',
+                 stage, file_name, exc_info=True)
+    return {
+        'file_name': file_name,
+        'ok': False,
+        'error': traceback.format_exc(limit=0).strip(),
+        'outputs': []
+    }
+
+
+async def _run_stage(handler, concurrency, in_queue, out_queue=None,
+                     out_concurrency=0):
+    """
+    Runs `concurrency` workers applying `handler` to `in_queue` items.
+
+    Non None handler results are put into `out_queue`. Queues are
+    finished with None sentinel, one per worker of the next stage.
+    """
+    async def worker():
+        while True:
+            item = await in_queue.get()
+            if item is None:
+                break
+            res = await handler(item)
+            if res is not None and out_queue is not None:
+                await out_queue.put(res)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    if out_queue is not None:
+        for _ in range(out_concurrency):
+            await out_queue.put(None)
+
+
+async def run_pipeline_async(file_names,
+                             dest_dir: str = None,
+                             read_concurrency: int = 4,
+                             parse_concurrency: int = 1,
+                             write_concurrency: int = 4,
+                             streaming: bool = False,
+                             metrics: bool = False,
+                             sink=None,
+                             dedup_images: bool = False,
+                             on_outcome=None,
+                             validation_rules=None,
+                             profile: bool = False,
+                             shared_memory: bool = True) -> list:
+    """Asyncio implementation of run_pipeline()"""
+    loop = asyncio.get_running_loop()
+    outcomes = []
+
+    def add_outcome(outcome):
+        outcomes.append(outcome)
+        if on_outcome:
+            on_outcome(outcome)
+
+    read_queue = asyncio.Queue(maxsize=2 * read_concurrency)
+    parse_queue = asyncio.Queue(maxsize=2 * parse_concurrency)
+    write_queue = asyncio.Queue(maxsize=2 * write_concurrency)
+
+    read_pool = ThreadPoolExecutor(max_workers=read_concurrency)
+    if shared_memory:
+        from shared_results import start_channel
+
+        shared_memory = start_channel()
+    parse_pool = ProcessPoolExecutor(max_workers=parse_concurrency)
+    write_pool = ThreadPoolExecutor(max_workers=write_concurrency)
+
+    async def produce():
+        # file names iterator could be a slow directory walk
+        file_names_iter = iter(file_names)
+        while True:
+            file_name = await loop.run_in_executor(
+                read_pool, next, file_names_iter, None
+            )
+            if file_name is None:
+                break
+            await read_queue.put(file_name)
+
+        for _ in range(read_concurrency):
+            await read_queue.put(None)
+
+    async def read(file_name):
+        logger.info('  >>>...>>>...>>>... Reading file: %s', file_name)
+        try:
+            data = await loop.run_in_executor(read_pool, read_data, file_name)
+        except Exception:
+            add_outcome(_failed_outcome(file_name, 'read'))
+            return None
+        return file_name, data
+
+    async def parse(item):
+        file_name, data = item
+        logger.info('Looking %s file for valuable content.', file_name)
+        try:
+            exported = await loop.run_in_executor(
+                parse_pool, parse_data, data, streaming, metrics,
+                validation_rules, profile, shared_memory
+            )
+        except Exception:
+            add_outcome(_failed_outcome(file_name, 'parse'))
+            return None
+        return file_name, exported
+
+    async def write(item):
+        file_name, exported = item
+        try:
+            outputs = await loop.run_in_executor(
+                write_pool, write_data, exported, dest_dir, sink,
+                dedup_images
+            )
+        except Exception:
+            add_outcome(_failed_outcome(file_name, 'write'))
+            return None
+        outcome = {
+            'file_name': file_name, 'ok': True, 'error': None,
+            'outputs': outputs, 'metrics': exported['metrics']
+        }
+        for key in ['issues', 'profile']:
+            if key in exported:
+                outcome[key] = exported[key]
+        add_outcome(outcome)
+        return None
+
+    try:
+        await asyncio.gather(
+            produce(),
+            _run_stage(read, read_concurrency, read_queue,
+                       parse_queue, parse_concurrency),
+            _run_stage(parse, parse_concurrency, parse_queue,
+                       write_queue, write_concurrency),
+            _run_stage(write, write_concurrency, write_queue),
+        )
+    finally:
+        read_pool.shutdown()
+        parse_pool.shutdown()
+        write_pool.shutdown()
+
+    return outcomes
+
+
+def run_pipeline(file_names,
+                 dest_dir: str = None,
+                 read_concurrency: int = 4,
+                 parse_concurrency: int = 1,
+                 write_concurrency: int = 4,
+                 streaming: bool = False,
+                 metrics: bool = False,
+                 sink=None,
+                 dedup_images: bool = False,
+                 on_outcome=None,
+                 validation_rules=None,
+                 profile: bool = False,
+                 shared_memory: bool = True) -> list:
+    """
+    Parses every file from `file_names` iterable with the pipeline.
+
+    Concurrency of every stage is limited separately. Results are
+    written to `sink` (output.AggregateOutput) if passed, identical
+    images are stored once if `dedup_images` is True. `on_outcome`
+    callback is called with every outcome as soon as the file is done.
+    Results are checked with `validation_rules` if passed,
+    paragraphs loading is profiled if `profile` is True. Large images
+    are passed from parsing processes through shared memory if
+    `shared_memory` is True.
+    Returns list of parsing outcomes in the same format as
+    parse.parse_file() does.
+    """
+    return asyncio.run(run_pipeline_async(
+        file_names,
+        dest_dir,
+        read_concurrency=max(read_concurrency, 1),
+        parse_concurrency=max(parse_concurrency, 1),
+        write_concurrency=max(write_concurrency, 1),
+        streaming=streaming,
+        metrics=metrics,
+        sink=sink,
+        dedup_images=dedup_images,
+        on_outcome=on_outcome,
+        validation_rules=validation_rules,
+        profile=profile,
+        shared_memory=shared_memory
+    ))
@@ -0,0 +1,142 @@
+"""
+Profiling of paragraphs loading.
+
+Profiler runs cProfile and measures wall time around
+ASOZDParser.load_paragraphs() with per paragraph costs
+(docx.metrics.ParagraphCosts): runs count, text length,
+classification and `text_re` time.
+
+Profiles of all files are merged into one pstats dump (could be
+viewed with pstats, snakeviz or converted to a flamegraph with
+flameprof) and ranked report of the most expensive files and
+paragraphs.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import time
+
+from docx.metrics import ParagraphCosts
+
+
+logger = logging.getLogger(__name__)
+
+# number of files and paragraphs in the ranked report
+PROFILE_TOP = 20
+
+
+class Profiler(object):
+    """
+    Context manager profiling the code within.
+
+    `paragraph_costs` has to be passed to the parser,
+    see ASOZDParser `paragraph_costs` argument.
+    """
+
+    def __init__(self):
+        self.paragraph_costs = ParagraphCosts()
+        self.seconds = 0.0
+        self._profile = cProfile.Profile()
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, res_type, value, traceback):
+        self._profile.disable()
+        self.seconds += time.perf_counter() - self._started
+
+    def as_dict(self) -> dict:
+        """
+        Returns collected profile as dict which could be
+        passed to another process: 'seconds', 'paragraphs'
+        (ParagraphCosts.as_list) and 'stats' (raw cProfile stats).
+        """
+        self._profile.create_stats()
+        return {
+            'seconds': self.seconds,
+            'paragraphs': self.paragraph_costs.as_list(),
+            'stats': self._profile.stats,
+        }
+
+
+class _RawStats(object):
+    """Raw cProfile stats accepted by pstats.Stats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def get_ranked_report(outcomes: list, top: int = PROFILE_TOP) -> dict:
+    """
+    Returns `top` most expensive files and paragraphs
+    of parsing outcomes with profiles (see parse.parse_file).
+    """
+    files = []
+    paragraphs = []
+    for outcome in outcomes:
+        profile = outcome.get('profile')
+        if not profile:
+            continue
+        files.append({
+            'file_name': outcome['file_name'],
+            'seconds': profile['seconds'],
+            'paragraphs': len(profile['paragraphs']),
+        })
+        paragraphs.extend(
+            dict(x, file_name=outcome['file_name'])
+            for x in profile['paragraphs']
+        )
+
+    files.sort(key=lambda x: x['seconds'], reverse=True)
+    paragraphs.sort(key=lambda x: x['seconds'], reverse=True)
+    return {'files': files[:top], 'paragraphs': paragraphs[:top]}
+
+
+def dump_profile(outcomes: list,
+                 file_name: str,
+                 top: int = PROFILE_TOP) -> dict:
+    """
+    Writes merged pstats dump of all outcomes profiles to `file_name`
+    and ranked report (see get_ranked_report) to the log and json
+    file named as `file_name` with '.json' extension. Returns the report.
+    """
+    stats = pstats.Stats()
+    for outcome in outcomes:
+        profile = outcome.get('profile')
+        if profile and profile['stats']:
+            stats.add(_RawStats(profile['stats']))
+    stats.dump_stats(file_name)
+    logger.info('Profile saved to %s', file_name)
+
+    report = get_ranked_report(outcomes, top)
+    report_file_name = os.path.splitext(file_name)[0] + '.json'
+    if report_file_name == file_name:
+        report_file_name += '.json'
+    with open(report_file_name, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info('Profile report saved to %s', report_file_name)
+
+    logger.info('='*50)
+    logger.info('The most expensive files:')
+    for item in report['files']:
+        logger.info('  %8.4fs %5d paragraphs  %s',
+                    item['seconds'], item['paragraphs'], item['file_name'])
+    logger.info('The most expensive paragraphs:')
+    for item in report['paragraphs']:
+        logger.info(
+            '  %8.4fs (classify %.4fs, text_re %.4fs) %4d runs %6d chars'
+            '  %s [%s]',
+            item['seconds'], item.get('classify_seconds', 0.0),
+            item.get('text_re_seconds', 0.0), item['runs'], item['length'],
+            item['file_name'], item['id']
+        )
+    logger.info('='*50)
+
+    return report
@@ -0,0 +1,265 @@
+"""
+Local HTTP server parsing docx files on demand.
+
+Server keeps a warm pool of worker processes with imported parser
+and loaded config, so a request doesn't pay interpreter start and
+imports. Endpoints:
+
+  * POST /parse            - docx content as request body
+  * POST /parse?path=FILE  - docx file name on the server side
+  * GET  /health           - server status
+
+Parsing results (ASOZDParser.get_results_for_save) are returned as
+json. Requests over the pool capacity wait in the queue, requests
+over the queue capacity are rejected with 503 status. If a worker
+process dies, the pool is restarted and the request being parsed
+is rejected with 503 status.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+logger = logging.getLogger(__name__)
+
+DEBUG = False
+
+# default limit of uploaded docx size
+MAX_CONTENT_LENGTH = 50 * 1024 * 1024
+
+
+def init_worker() -> None:
+    """Imports parser and compiles its config once per worker process"""
+    import asozd  # noqa: F401
+    from compiled_config import get_default_config
+
+    get_default_config()
+
+
+def warm_up() -> int:
+    """Does nothing, used to start worker processes in advance"""
+    return os.getpid()
+
+
+def parse_results(data: bytes = None,
+                  file_name: str = None,
+                  streaming: bool = False) -> dict:
+    """Parses docx content or file and returns results for save"""
+    from asozd import ASOZDParser
+
+    source = file_name if data is None else data
+    with ASOZDParser(source, debug=DEBUG, streaming=streaming) as P:
+        P.load_paragraphs()
+        return P.get_results_for_save()
+
+
+class ParseRequestHandler(BaseHTTPRequestHandler):
+    """Handler of parsing requests, see module description"""
+
+    server_version = 'ASOZDParser/1'
+
+    def log_message(self, format, *args):
+        logger.info('%s - %s', self.address_string(), format % args)
+
+    def _send_json(self, status, content):
+        body = json.dumps(content, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json(status, {'error': message})
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            return self._send_error(HTTPStatus.NOT_FOUND, 'Unknown endpoint')
+        self._send_json(HTTPStatus.OK, {
+            'status': 'ok',
+            'workers': self.server.workers,
+            'active': self.server.get_active_requests(),
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/parse':
+            return self._send_error(HTTPStatus.NOT_FOUND, 'Unknown endpoint')
+
+        file_name = parse_qs(url.query).get('path', [None])[0]
+        data = None
+        if file_name is None:
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = 0
+            if length <= 0:
+                return self._send_error(
+                    HTTPStatus.BAD_REQUEST,
+                    'Docx content or `path` parameter is expected'
+                )
+            if length > self.server.max_content_length:
+                self.close_connection = True
+                return self._send_error(
+                    HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    'Docx content is too large'
+                )
+            data = self.rfile.read(length)
+        elif not os.path.isfile(file_name):
+            return self._send_error(
+                HTTPStatus.NOT_FOUND, "Couldn't find file: {}".format(file_name)
+            )
+
+        if not self.server.acquire():
+            return self._send_error(
+                HTTPStatus.SERVICE_UNAVAILABLE, 'Server is busy'
+            )
+        executor = self.server.executor
+        try:
+            future = executor.submit(
+                parse_results, data, file_name, self.server.streaming
+            )
+            results = future.result()
+        except BrokenProcessPool:
+            logger.exception('Worker died parsing %s', file_name or '<bytes>')
+            self.server.restart_executor(executor)
+            return self._send_error(
+                HTTPStatus.SERVICE_UNAVAILABLE, 'Worker process died'
+            )
+        except Exception as e:
+            logger.exception('Parsing error for %s', file_name or '<bytes>')
+            return self._send_error(
+                HTTPStatus.UNPROCESSABLE_ENTITY,
+                '{}: {}'.format(type(e).__name__, e)
+            )
+        finally:
+            self.server.release()
+
+        self._send_json(HTTPStatus.OK, results)
+
+
+class ParseServer(ThreadingHTTPServer):
+    """
+    HTTP server with a pool of parsing worker processes.
+
+    At most `workers` + `queue_size` requests are accepted at once.
+    """
+
+    daemon_threads = True
+
+    def __init__(self,
+                 server_address,
+                 workers: int = 2,
+                 queue_size: int = 8,
+                 streaming: bool = False,
+                 max_content_length: int = MAX_CONTENT_LENGTH):
+        super(ParseServer, self).__init__(server_address, ParseRequestHandler)
+        self.workers = max(workers, 1)
+        self.streaming = streaming
+        self.max_content_length = max_content_length
+
+        self._capacity = self.workers + max(queue_size, 0)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._executor_lock = threading.Lock()
+
+        self.executor = self._start_executor()
+
+    def _start_executor(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=init_worker
+        )
+        # starting all workers before the first request
+        for future in [executor.submit(warm_up)
+                       for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def restart_executor(self, broken: ProcessPoolExecutor) -> None:
+        """
+        Replaces `broken` pool with a new one.
+
+        Does nothing if the pool has been replaced already
+        by another request.
+        """
+        with self._executor_lock:
+            if self.executor is not broken:
+                return
+            logger.warning('Worker pool is broken, restarting it')
+            broken.shutdown()
+            self.executor = self._start_executor()
+
+    def acquire(self) -> bool:
+        """Takes a place for the request, returns False if it's full"""
+        with self._lock:
+            if self._active >= self._capacity:
+                return False
+            self._active += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._active -= 1
+
+    def get_active_requests(self) -> int:
+        """Returns number of parsing and queued requests"""
+        return self._active
+
+    def server_close(self):
+        super(ParseServer, self).server_close()
+        self.executor.shutdown()
+
+
+def serve(*,
+          host: str = '127.0.0.1',
+          port: int = 8080,
+          workers: int = 2,
+          queue_size: int = 8,
+          streaming: bool = False,
+          max_content_length: int = MAX_CONTENT_LENGTH,
+          verbose: bool = False) -> None:
+    """
+    Run local HTTP server parsing docx files on demand.
+
+    :param host: Interface to listen on
+    :param port: Port to listen on
+    :param workers: Number of parsing worker processes
+    :param queue_size: Number of requests waiting for a free worker,
+                       the rest are rejected with 503 status
+    :param streaming: Read document paragraphs one by one instead of
+                      loading the whole document tree into memory
+    :param max_content_length: Max size of uploaded docx in bytes
+    :param verbose: Increase output verbosity
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.DEBUG if verbose else logging.INFO)
+
+    server = ParseServer(
+        (host, port),
+        workers=workers,
+        queue_size=queue_size,
+        streaming=streaming,
+        max_content_length=max_content_length
+    )
+    logger.info('Serving on http://%s:%d with %d workers',
+                host, server.server_address[1], server.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    from clize import run
+
+    run(serve)
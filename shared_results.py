@@ -0,0 +1,116 @@
+"""
+Shared memory channel for exported parsing results.
+
+Exported results (see ASOZDParser.export_results) returned by worker
+processes are pickled and sent to the parent through a pipe, which is
+expensive for images content. Images larger than a threshold are put
+into `multiprocessing.shared_memory` segments instead, and only small
+SharedPayload descriptors are pickled:
+  * start_channel   - prepares the parent, has to be called before
+                      worker processes are started
+  * share_exported  - worker side, moves large images into segments
+  * attach_exported - parent side, maps segments as memoryviews and
+                      removes them when results are written
+
+Workers share resource tracker of the parent, so segments left by an
+interrupted run are removed by the tracker when the parent exits.
+If shared memory isn't supported (Python 3.7, Windows), results are
+pickled as usual.
+"""
+import contextlib
+import logging
+from typing import NamedTuple
+
+
+logger = logging.getLogger(__name__)
+
+# images of this size and larger are passed through shared memory,
+# smaller ones are pickled faster (see bench/bench_ipc.py)
+SHARED_MEMORY_THRESHOLD = 256 * 1024
+
+
+class SharedPayload(NamedTuple):
+    """Descriptor of content put into shared memory segment"""
+    name: str
+    size: int
+
+
+def start_channel() -> bool:
+    """
+    Prepares the parent process for receiving shared results.
+
+    Starts resource tracker, so it's inherited by worker processes
+    started afterwards. Returns False if shared memory isn't supported.
+    """
+    try:
+        from multiprocessing import resource_tracker, shared_memory  # noqa
+    except ImportError:
+        logger.debug('Shared memory is not supported, results are pickled')
+        return False
+
+    resource_tracker.ensure_running()
+    return True
+
+
+def share_exported(exported: dict, threshold: int = None) -> dict:
+    """
+    Returns exported results with images content of `threshold` size
+    (SHARED_MEMORY_THRESHOLD by default) and larger replaced with
+    SharedPayload descriptors.
+    """
+    from multiprocessing import shared_memory
+
+    if threshold is None:
+        threshold = SHARED_MEMORY_THRESHOLD
+
+    images = []
+    for image_file_name, image_data in exported['images']:
+        size = len(image_data)
+        if size and size >= threshold:
+            segment = shared_memory.SharedMemory(create=True, size=size)
+            try:
+                segment.buf[:size] = image_data
+            finally:
+                # segment exists until the parent removes it
+                segment.close()
+            image_data = SharedPayload(segment.name, size)
+        images.append((image_file_name, image_data))
+
+    return dict(exported, images=images)
+
+
+@contextlib.contextmanager
+def attach_exported(exported: dict):
+    """
+    Context manager returning exported results with SharedPayload
+    descriptors replaced with memoryviews of the segments content.
+
+    Segments are removed on exit, so the content mustn't be
+    used outside of the context.
+    """
+    if not any(isinstance(data, SharedPayload)
+               for _, data in exported['images']):
+        yield exported
+        return
+
+    from multiprocessing import shared_memory
+
+    segments = []
+    views = []
+    try:
+        images = []
+        for image_file_name, image_data in exported['images']:
+            if isinstance(image_data, SharedPayload):
+                segment = shared_memory.SharedMemory(name=image_data.name)
+                segments.append(segment)
+                image_data = segment.buf[:image_data.size]
+                views.append(image_data)
+            images.append((image_file_name, image_data))
+
+        yield dict(exported, images=images)
+    finally:
+        for view in views:
+            view.release()
+        for segment in segments:
+            segment.close()
+            segment.unlink()
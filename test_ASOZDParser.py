@@ -1,9 +1,21 @@
+import errno
 import logging
 import os
+import shutil
+import tempfile
+import copy
 import unittest
+import io
 import json
+from unittest import mock
+from zipfile import BadZipFile, ZipFile
 
-from asozd import ASOZDParser
+from asozd import ASOZDParser, dedup_image_file
+from asozd import normalize_items, parse_docx_data
+from bench.docx_factory import make_docx
+from compiled_config import compile_config
+from docx.metrics import Metrics
+from parser_config import config
 
 logger = logging.getLogger(__name__)
 
@@ -351,3 +363,376 @@ class ASOZDParserResultsTest2(unittest.TestCase):
                'неразговорчивы.')
         self.maxDiff = None
         self.assertEqual(self.data['conclusion'], tgt)
+
+
+class ASOZDParserStreamingTest(unittest.TestCase):
+    """ASOZDParser streaming mode tests"""
+
+    def _get_results(self, file_name, **kwargs):
+        instance = ASOZDParser(os.path.join(SOURCE_DIR, file_name), **kwargs)
+        instance.load_paragraphs()
+        return instance.get_results_for_save()
+
+    def test_streaming_results_equal_to_default(self):
+        """Streaming mode results are equal to the default mode ones"""
+        for file_name in [SOURCE_FNAME1, SOURCE_FNAME2]:
+            with self.subTest(file_name=file_name):
+                self.assertEqual(
+                    self._get_results(file_name, streaming=True),
+                    self._get_results(file_name)
+                )
+
+
+class ASOZDParserSyntheticDocumentTest(unittest.TestCase):
+    """ASOZDParser tests on generated documents"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.mkdtemp()
+        cls.file_name = make_docx(
+            os.path.join(cls.work_dir, 'synthetic.docx'),
+            paragraphs=5, hyperlinks=2, images=2, lobby_items=7
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_dir)
+
+    def test_synthetic_document_results(self):
+        """All sections of generated document are recognized"""
+        for streaming in [False, True]:
+            with self.subTest(streaming=streaming):
+                with ASOZDParser(self.file_name,
+                                 streaming=streaming) as instance:
+                    instance.load_paragraphs()
+                    data = instance.get_results_for_save()
+
+                self.assertEqual(data['fio'], 'Иванов Иван Иванович')
+                self.assertEqual(len(data['photo']), 2)
+                self.assertEqual(data['family'], 'Женат, имеет двух сыновей.')
+                self.assertEqual(len(data['lobby']), 7)
+                self.assertEqual(data['bio'].count('<a href='), 2)
+
+    def test_non_picture_drawings_are_skipped(self):
+        """Shapes next to the photo don't break parsing"""
+        file_name = make_docx(
+            os.path.join(self.work_dir, 'shapes.docx'),
+            paragraphs=1, images=1, shapes=2
+        )
+        for streaming in [False, True]:
+            with self.subTest(streaming=streaming):
+                with ASOZDParser(file_name, streaming=streaming) as instance:
+                    instance.load_paragraphs()
+                    data = instance.get_results_for_save()
+
+                self.assertEqual(data['fio'], 'Иванов Иван Иванович')
+                self.assertEqual(len(data['photo']), 1)
+
+    def _parse_with_config(self, streaming, **type_settings):
+        with ASOZDParser(self.file_name, streaming=streaming) as instance:
+            instance.config = copy.deepcopy(config)
+            for res_type, settings in type_settings.items():
+                instance.config['types'][res_type].update(settings)
+            instance._init_config()
+            instance.load_paragraphs()
+            return instance.get_results_for_save()
+
+    def test_max_paragraphs(self):
+        """Paragraphs over section limit are skipped"""
+        for streaming in [False, True]:
+            with self.subTest(streaming=streaming):
+                data = self._parse_with_config(
+                    streaming, lobby={'max_paragraphs': 4}, bio={
+                        'max_paragraphs': 2
+                    }
+                )
+                self.assertEqual(len(data['lobby']), 3)
+                # title and the first paragraph (3 sentences) only
+                self.assertEqual(data['bio'].count('Родился'), 3)
+                self.assertTrue(data['relations'])
+
+    def test_stop_parsing_when_closed(self):
+        """Parsing is stopped when configured section is closed"""
+        for streaming in [False, True]:
+            with self.subTest(streaming=streaming):
+                data = self._parse_with_config(
+                    streaming, relations={'stop_parsing_when_closed': True}
+                )
+                self.assertEqual(data['family'], 'Женат, имеет двух сыновей.')
+                self.assertTrue(data['relations'])
+                self.assertIsNone(data['submitted'])
+                self.assertEqual(data['lobby'], [])
+
+
+class ASOZDParserContextManagerTest(unittest.TestCase):
+    """ASOZDParser context manager tests"""
+
+    def test_docx_is_opened_once_and_closed_on_exit(self):
+        """Parser uses single docx archive which is closed on exit"""
+        file_name = os.path.join(SOURCE_DIR, SOURCE_FNAME1)
+        with ASOZDParser(file_name) as instance:
+            instance.load_paragraphs()
+            self.assertIs(instance.get_doc(), instance)
+            zip_file = instance.zip_file
+            self.assertIsNotNone(zip_file.fp)
+
+        self.assertIsNone(zip_file.fp)
+
+
+class ASOZDParserMetricsTest(unittest.TestCase):
+    """ASOZDParser instrumentation tests"""
+
+    def test_metrics_are_collected_for_all_stages(self):
+        """Wall time, calls and bytes are collected for parsing stages"""
+        dest_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dest_dir)
+
+        for streaming in [False, True]:
+            with self.subTest(streaming=streaming):
+                metrics = Metrics()
+                file_name = os.path.join(SOURCE_DIR, SOURCE_FNAME1)
+                with ASOZDParser(file_name, streaming=streaming,
+                                 metrics=metrics) as instance:
+                    instance.load_paragraphs()
+                    instance.save_all_results(results_dir=dest_dir)
+
+                data = metrics.as_dict()
+                self.assertEqual(set(data), {
+                    '_open_docx', 'load_document_data',
+                    'load_relationships_data', 'recognize_paragraph',
+                    'text_re', 'save_results_json', 'save_result_images'
+                })
+                self.assertEqual(data['load_document_data']['calls'], 1)
+                self.assertEqual(data['save_result_images']['bytes'], 4460)
+
+
+class ASOZDParserImagesTest(unittest.TestCase):
+    """Images saving tests"""
+
+    def setUp(self):
+        self.dest_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dest_dir)
+
+    def test_copy_docx_image(self):
+        """Stored and compressed images are copied byte to byte"""
+        for fname, image_name in [(SOURCE_FNAME1, 'media/image2.jpg'),
+                                  (SOURCE_FNAME2, 'media/image1.png')]:
+            file_name = os.path.join(SOURCE_DIR, fname)
+            with ZipFile(file_name) as zf:
+                expected = zf.read('word/' + image_name)
+
+            with open(file_name, 'rb') as f:
+                data = f.read()
+            for source in [file_name, io.BytesIO(data)]:
+                with self.subTest(fname=fname, source=type(source)):
+                    with ASOZDParser(source) as instance:
+                        dest = os.path.join(self.dest_dir, 'image')
+                        with open(dest, 'wb') as fimg:
+                            fimg.write(b'prefix')
+                            nbytes = instance.copy_docx_image(
+                                image_name, fimg
+                            )
+                            fimg.write(b'suffix')
+                    with open(dest, 'rb') as fimg:
+                        self.assertEqual(
+                            fimg.read(), b'prefix' + expected + b'suffix'
+                        )
+                    self.assertEqual(nbytes, len(expected))
+
+    def test_dedup_image_file(self):
+        """Identical images are hard linked to the single stored copy"""
+        images_dir = os.path.join(self.dest_dir, 'images')
+        os.makedirs(images_dir)
+        file_names = []
+        for name, data in [('a', b'image'), ('b', b'image'), ('c', b'other')]:
+            file_name = os.path.join(images_dir, name + '.png')
+            with open(file_name, 'wb') as f:
+                f.write(data)
+            file_names.append(file_name)
+
+        stored = [dedup_image_file(x, self.dest_dir) for x in file_names]
+
+        self.assertEqual(stored[0], stored[1])
+        self.assertNotEqual(stored[0], stored[2])
+        self.assertTrue(os.path.samefile(file_names[0], file_names[1]))
+        self.assertFalse(os.path.samefile(file_names[0], file_names[2]))
+        with open(file_names[1], 'rb') as f:
+            self.assertEqual(f.read(), b'image')
+
+        # saving again doesn't change the stored content
+        with ASOZDParser(os.path.join(SOURCE_DIR, SOURCE_FNAME2)) as P:
+            P.load_paragraphs()
+            saved = P.save_all_results(results_dir=self.dest_dir,
+                                       dedup_images=True)
+            saved_again = P.save_all_results(results_dir=self.dest_dir,
+                                             dedup_images=True)
+        self.assertEqual(saved, saved_again)
+        with open(file_names[0], 'rb') as f:
+            self.assertEqual(f.read(), b'image')
+
+    def _write_images(self, *contents):
+        images_dir = os.path.join(self.dest_dir, 'images')
+        os.makedirs(images_dir, exist_ok=True)
+        file_names = []
+        for idx, data in enumerate(contents):
+            file_name = os.path.join(images_dir, '{}.png'.format(idx))
+            with open(file_name, 'wb') as f:
+                f.write(data)
+            file_names.append(file_name)
+        return file_names
+
+    def test_dedup_image_file_race(self):
+        """Image stored by another process meanwhile is linked"""
+        first, second = self._write_images(b'image', b'image')
+        link = os.link
+
+        def link_after_other_process(src, dst):
+            if src == second:
+                # another process stores the same image first
+                link(first, dst)
+            return link(src, dst)
+
+        with mock.patch('os.link', side_effect=link_after_other_process):
+            stored = dedup_image_file(second, self.dest_dir)
+        self.assertTrue(os.path.samefile(second, stored))
+        self.assertTrue(os.path.samefile(first, stored))
+
+    def test_dedup_image_file_without_hard_links(self):
+        """Copy is kept only if hard links aren't supported"""
+        file_name, = self._write_images(b'image')
+        for error, expected in [(errno.EXDEV, None), (errno.ENOSPC, OSError)]:
+            with self.subTest(error=errno.errorcode[error]):
+                with mock.patch('os.link', side_effect=OSError(error, '')):
+                    if expected:
+                        with self.assertRaises(expected):
+                            dedup_image_file(file_name, self.dest_dir)
+                    else:
+                        stored = dedup_image_file(file_name, self.dest_dir)
+                        self.assertFalse(os.path.exists(stored))
+
+    def test_copy_docx_image_checks_crc(self):
+        """Corrupted not compressed image isn't copied silently"""
+        file_name = os.path.join(self.dest_dir, SOURCE_FNAME2)
+        shutil.copy(os.path.join(SOURCE_DIR, SOURCE_FNAME2), file_name)
+        with ASOZDParser(file_name) as instance:
+            offset = instance._get_stored_member_offset(
+                instance.zip_file.getinfo('word/media/image1.png')
+            )
+        with open(file_name, 'r+b') as f:
+            f.seek(offset + 100)
+            byte = f.read(1)
+            f.seek(offset + 100)
+            f.write(bytes([byte[0] ^ 0xff]))
+
+        with ASOZDParser(file_name) as instance:
+            with open(os.path.join(self.dest_dir, 'image'), 'wb') as fimg:
+                with self.assertRaises(BadZipFile):
+                    instance.copy_docx_image('media/image1.png', fimg)
+
+
+class ASOZDParserInMemoryTest(unittest.TestCase):
+    """Parsing of in-memory docx content tests"""
+
+    def test_parse_docx_data(self):
+        """Bytes, memoryview and file-like content is parsed as file"""
+        file_name = os.path.join(SOURCE_DIR, SOURCE_FNAME1)
+        expected = parse_docx_data(file_name)
+        with open(file_name, 'rb') as f:
+            data = f.read()
+        with ZipFile(file_name) as zf:
+            image_data = zf.read('word/media/image2.jpg')
+
+        for source in [data, bytearray(data), memoryview(data),
+                       io.BytesIO(data)]:
+            with self.subTest(source=type(source)):
+                exported = parse_docx_data(source, streaming=True)
+                self.assertEqual(exported, expected)
+                self.assertEqual(exported['images'], [
+                    (os.path.join('images', 'Бессарабов Даниил '
+                                  'Владимирович.jpg'), image_data)
+                ])
+
+    def test_display_name(self):
+        """In-memory content has a placeholder name"""
+        file_name = os.path.join(SOURCE_DIR, SOURCE_FNAME1)
+        with open(file_name, 'rb') as f:
+            data = f.read()
+        with ASOZDParser(data) as instance:
+            self.assertEqual(instance.get_display_name(), '<bytes>')
+        with ASOZDParser(file_name) as instance:
+            self.assertEqual(instance.get_display_name(), file_name)
+
+
+class NormalizeItemsTest(unittest.TestCase):
+    """normalize_items() tests"""
+
+    items = [' a ', 'b  c', '', ' \t', 'a', 'b  c']
+
+    def test_no_normalization(self):
+        """Items are copied as is by default"""
+        res = normalize_items(self.items)
+        self.assertEqual(res, self.items)
+        self.assertIsNot(res, self.items)
+
+    def test_remove_empty(self):
+        """Whitespace only items are removed as `split()` check does"""
+        self.assertEqual(
+            normalize_items(self.items, remove_empty=True),
+            [y for y in self.items if y.split()]
+        )
+
+    def test_all_steps(self):
+        """Steps are applied in batch"""
+        self.assertEqual(
+            normalize_items(self.items, strip=True, remove_empty=True,
+                            dedupe=True),
+            ['a', 'b  c']
+        )
+        self.assertEqual(
+            normalize_items(self.items, collapse_whitespace=True,
+                            remove_empty=True, dedupe=True),
+            ['a', 'b c']
+        )
+
+    def test_add_result_accumulates_fragments(self):
+        """Text fragments added one by one are joined on demand"""
+        with ASOZDParser(os.path.join(SOURCE_DIR, SOURCE_FNAME1)) as P:
+            for idx in range(1000):
+                P.add_result('lobby', P.linesep + 'item {}'.format(idx))
+            results = P.get_internal_results()['lobby']
+            self.assertEqual(len(results['raw_text']), 2000)
+            self.assertEqual(results['text'], ''.join(
+                P.linesep + 'item {}'.format(idx) for idx in range(1000)
+            ))
+            self.assertEqual(len(P.get_results_for_save()['lobby']), 1000)
+
+
+class ParagraphClassifierTest(unittest.TestCase):
+    """ParagraphClassifier tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.classifier = compile_config(config).classifier
+
+    def test_classify_by_check_re(self):
+        """Paragraph type is recognized by `check_re`"""
+        self.assertEqual(
+            self.classifier.classify('Бессарабов Даниил Владимирович'), 'fio'
+        )
+        self.assertEqual(
+            self.classifier.classify('Группы интересов: региональное лобби'),
+            'lobby'
+        )
+
+    def test_classify_respects_not_re(self):
+        """Type rejected by `not_re` gives a way to the next one"""
+        self.assertEqual(
+            self.classifier.classify('Представитель Иванов Иван'),
+            'position'
+        )
+
+    def test_classify_unknown_text(self):
+        """Unknown text isn't recognized"""
+        self.assertEqual(self.classifier.classify('просто текст'), None)
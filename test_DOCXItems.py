@@ -1,13 +1,16 @@
 import os
+import tempfile
 import unittest
 from zipfile import ZipFile
 
 from bs4 import BeautifulSoup
 
+from bench.docx_factory import make_docx
 from docx.document import DOCXDocument
 from docx.document import DOCX_CONTENTS_FILE_NAME, DOCX_RELS_FILE_NAME
 from docx.items import DOCXBr, DOCXRun, DOCXText
 from docx.items import DOCXDrawing, DOCXHyperlink, DOCXParagraph
+from docx.records import DOCXParagraphRecord
 
 DEFAULT_PARSER = 'lxml-xml'
 
@@ -189,6 +192,10 @@ class DOCXParagraphTest(DOCXItemTest):
         # using pi (paragraph image) which contains two child <w:r> elements
         self.assertEqual([x.name for x in self.pi.getChildren()], ['r', 'r'])
 
+    def test_DOCXParagraph_getRunCount(self):
+        """<w:p> getRunCount() returns number of child <w:r> elements"""
+        self.assertEqual(self.pi.getRunCount(), 2)
+
     def test_DOCXParagraph_getRawText(self):
         """<w:p> getRawText() returns list with <w:r> contents"""
         tgt = [('Депутат Государственной Думы VII созыва, избран от '
@@ -198,6 +205,15 @@ class DOCXParagraphTest(DOCXItemTest):
 
         self.assertEqual(self.p.getRawText(), tgt)
 
+    def test_DOCXParagraph_text_is_extracted_once(self):
+        """<w:p> text is extracted once and reused by all getters"""
+        raw_text = self.p.getRawText()
+        raw_text.append('modified copy')
+
+        self.assertEqual(self.p.getRawText(), raw_text[:-1])
+        self.assertIs(self.p.getText(), self.p.getText())
+        self.assertEqual(self.p.getCleanedText(), self.p.getText())
+
     def test_DOCXParagraph_getImages_with_images_exists(self):
         """
         <w:p> getImages() return <w:drawings> only
@@ -214,5 +230,91 @@ class DOCXParagraphTest(DOCXItemTest):
         self.assertEqual([t.name for t in self.p.getImages()], [])
 
 
+class DOCXParagraphRecordTest(unittest.TestCase):
+    """DOCXParagraphRecord tests"""
+
+    def _get_records(self, **kwargs):
+        with DOCXDocument(os.path.join('test', 'source_n1.docx'),
+                          **kwargs) as doc:
+            doc.load()
+            return list(doc.get_doc_paragraph_records_iter())
+
+    def test_DOCXParagraphRecord_has_no_dict(self):
+        """Record is a compact __slots__ object"""
+        record = DOCXParagraphRecord('1', ['a', 'b'])
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(record.getText(), 'ab')
+
+    def test_DOCXParagraphRecord_from_element_equals_from_paragraph(self):
+        """Records built from lxml elements and bs4 tags are the same"""
+        records = self._get_records()
+        streamed_records = self._get_records(streaming=True)
+
+        self.assertEqual(len(records), len(streamed_records))
+        for record, streamed in zip(records, streamed_records):
+            self.assertEqual(record.getId(), streamed.getId())
+            self.assertEqual(record.getRawText(), streamed.getRawText())
+            self.assertEqual(record.getImageIds(), streamed.getImageIds())
+            self.assertEqual(record.getRunCount(), streamed.getRunCount())
+
+    def test_DOCXParagraphRecord_getImageIds(self):
+        """Record contains relationship identifiers of images"""
+        self.assertEqual(self._get_records()[0].getImageIds(), ['rId6'])
+
+    def test_DOCXParagraphRecord_skips_non_picture_drawings(self):
+        """Shapes have no image relationship identifiers"""
+        with tempfile.TemporaryDirectory() as work_dir:
+            file_name = make_docx(
+                os.path.join(work_dir, 'shapes.docx'), images=1, shapes=1
+            )
+            for streaming in [False, True]:
+                with self.subTest(streaming=streaming):
+                    with DOCXDocument(file_name, streaming=streaming) as doc:
+                        doc.load()
+                        record = next(doc.get_doc_paragraph_records_iter())
+                    self.assertEqual(record.getImageIds(), ['rId1'])
+
+            with DOCXDocument(file_name) as doc:
+                doc.load()
+                para = DOCXParagraph(
+                    next(iter(doc.get_doc_paragraphs_iter())), docx=doc
+                )
+                self.assertEqual(
+                    [(x.isPicture(), x.getImageRelationshipId())
+                     for x in para.getDrawings()],
+                    [(True, 'rId1'), (False, None)]
+                )
+
+
+class DOCXDocumentRelationshipsTest(unittest.TestCase):
+    """DOCXDocument relationships tests"""
+
+    def test_relationships_are_loaded_on_first_access(self):
+        """Relationships aren't parsed until the first lookup"""
+        with DOCXDocument(os.path.join('test', 'source_n1.docx')) as doc:
+            doc.load()
+            self.assertIsNone(doc._rels_dict)
+            self.assertEqual(
+                doc.get_relationship_target_by_id('rId6'),
+                'media/image2.jpg'
+            )
+            self.assertIsNone(doc.get_relationship_target_by_id('rId999'))
+
+    def test_relationships_are_not_shared(self):
+        """Every document has its own relationships"""
+        docs = [DOCXDocument(os.path.join('test', x))
+                for x in ['source_n1.docx', 'source_n2.docx']]
+        try:
+            self.assertEqual(
+                [x.get_relationship_target_by_id('rId6') for x in docs],
+                ['media/image2.jpg',
+                 'http://www.duma.gov.ru/structure/factions/er/']
+            )
+            self.assertIsNot(docs[0].rels_dict, docs[1].rels_dict)
+        finally:
+            for doc in docs:
+                doc.close()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,147 @@
+import copy
+import os
+import subprocess
+import sys
+import unittest
+
+from compiled_config import (COMPILED_CONFIGS_CACHE_SIZE, ConfigError,
+                             _compiled_configs, compile_config,
+                             get_compiled_config, get_default_config,
+                             search_text_re)
+from parser_config import config
+
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+# max time of one config expression call on pathological inputs
+# of REGEX_BUDGET_SIZE chars, seconds (see bench/bench_regex.py)
+REGEX_BUDGET = 0.1
+REGEX_BUDGET_SIZE = 16000
+
+
+class CompiledConfigTest(unittest.TestCase):
+    """compile_config() tests"""
+
+    def _compile_with(self, res_type, **settings):
+        custom = copy.deepcopy(config)
+        custom['types'][res_type].update(settings)
+        return compile_config(custom)
+
+    def test_default_config_is_compiled(self):
+        """Types are compiled with typed flags and ordered table"""
+        compiled = get_default_config()
+
+        self.assertEqual(list(compiled.types), list(config['types']))
+        self.assertEqual(
+            [x.name for x in compiled.ordered],
+            ['fio', 'position', 'fraction', 'bio', 'relations',
+             'submitted', 'conclusion', 'lobby']
+        )
+        self.assertTrue(compiled.types['photo'].is_image)
+        self.assertFalse(compiled.types['fio'].is_image)
+        self.assertEqual(compiled.types['fio'].also_contains, ('photo',))
+        self.assertTrue(compiled.types['family'].text_re.search(
+            'Женат, имеет двух сыновей.'
+        ))
+
+    def test_compiled_config_is_shared(self):
+        """Config dict is compiled once"""
+        self.assertIs(get_default_config(), get_default_config())
+        self.assertIs(get_compiled_config(config), get_compiled_config(config))
+        self.assertIs(get_default_config(), get_compiled_config(config))
+
+    def test_compiled_configs_cache_is_bounded(self):
+        """Only the last used custom configs are kept compiled"""
+        customs = [copy.deepcopy(config)
+                   for _ in range(COMPILED_CONFIGS_CACHE_SIZE + 1)]
+        compiled = [get_compiled_config(x) for x in customs]
+
+        self.assertIs(get_compiled_config(customs[-1]), compiled[-1])
+        self.assertIsNot(get_compiled_config(customs[0]), compiled[0])
+        self.assertLessEqual(
+            len(_compiled_configs), COMPILED_CONFIGS_CACHE_SIZE
+        )
+
+    def test_compiled_config_is_immutable(self):
+        """Compiled config couldn't be changed"""
+        compiled = get_default_config()
+        with self.assertRaises(TypeError):
+            compiled.types['fio'] = None
+        with self.assertRaises(AttributeError):
+            compiled.types['fio'].is_image = True
+
+    def test_invalid_config_is_rejected(self):
+        """Unknown keys, wrong values and bad regexps are rejected"""
+        for res_type, settings in [
+                ('fio', {'check_regexp': '^a'}),
+                ('fio', {'check_re': '(unclosed'}),
+                ('family', {'text_re': '[a-'}),
+                ('fio', {'is_image': 'yes'}),
+                ('fio', {'also_contains': ['portrait']}),
+                ('lobby', {'max_paragraphs': 0}),
+                ('family', {'text_re_keywords': 'Женат'}),
+                ('family', {'text_re_timeout': 0}),
+                ('bio', {'order_id': None})]:
+            with self.subTest(res_type=res_type, settings=settings):
+                with self.assertRaises(ConfigError):
+                    self._compile_with(res_type, **settings)
+
+        with self.assertRaises(ConfigError):
+            compile_config({'types': {}, 'version': 2})
+
+    def test_text_re_keywords(self):
+        """text_re is searched only within texts with keywords"""
+        family = get_default_config().types['family']
+        text = 'Женат, имеет двух сыновей.'
+
+        self.assertEqual(
+            search_text_re(family, text).group(0), family.text_re.search(
+                text
+            ).group(0)
+        )
+        # text_re matches 'Разведен.' too, but it's not a keyword
+        custom = self._compile_with(
+            'family', text_re='Разведен.*', text_re_keywords=['Женат']
+        ).types['family']
+        self.assertIsNone(search_text_re(custom, 'Разведен.'))
+        self.assertIsNone(search_text_re(family, 'а' * 20000))
+
+    def test_text_re_is_linear(self):
+        """Keyword after a long words run doesn't make search backtrack"""
+        family = get_default_config().types['family']
+        text = 'а' * REGEX_BUDGET_SIZE + '1 Женат.'
+
+        self.assertEqual(search_text_re(family, text).group(0), ' Женат.')
+        self.assertEqual(
+            search_text_re(family, 'Депутат женат с 2013 г., имеет дочь.')
+            .group(0),
+            'Депутат женат с 2013 г., имеет дочь.'
+        )
+
+    def test_expressions_are_within_budget(self):
+        """Regex benchmark passes with budget on pathological inputs"""
+        subprocess.run(
+            [sys.executable, '-m', 'bench.bench_regex',
+             '--sizes', str(REGEX_BUDGET_SIZE), '--repeat', '1',
+             '--budget', str(REGEX_BUDGET)],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        )
+
+    def test_text_re_timeout(self):
+        """text_re search is cut off with timeout by regex module"""
+        try:
+            import regex  # noqa: F401
+        except ImportError:
+            with self.assertRaises(ConfigError):
+                self._compile_with('family', text_re_timeout=0.1)
+            self.skipTest("'regex' package isn't installed")
+
+        family = self._compile_with(
+            'family', text_re_timeout=0.01
+        ).types['family']
+        self.assertIsNone(search_text_re(family, 'а' * 100000 + '1 Женат.'))
+        self.assertTrue(search_text_re(family, 'Женат, имеет двух сыновей.'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,462 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from zipfile import ZipFile
+
+from bench.docx_factory import make_docx
+from output import AggregateOutput
+from parse import (PENDING_FILES_PER_WORKER, filter_filenames,
+                   is_filename_fit, parse_file, parse_files)
+from parse_cache import ParseCache
+from parse_journal import ParseJournal
+from pipeline import run_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+SOURCE_DIR = os.path.join(BASE_DIR, 'test')
+SOURCE_FNAMES = ['source_n1.docx', 'source_n2.docx']
+
+# max cumulative import time of parse.py module, microseconds
+# (lazy imports take about 60 ms, eager ones about 170 ms more)
+IMPORT_TIME_BUDGET = 150000
+# number of import time measurements, the best one is checked
+IMPORT_TIME_REPEAT = 3
+# modules which mustn't be imported before they're really needed
+LAZY_MODULES = ['bs4', 'lxml', 'clize', 'asyncio', 'multiprocessing',
+                'parser_config', 'gzip', 'tarfile']
+
+
+class ParseTestCase(unittest.TestCase):
+    """Common class for parsing tests"""
+
+    def setUp(self):
+        self.dest_dir = tempfile.mkdtemp()
+        self.file_names = [
+            os.path.join(SOURCE_DIR, x) for x in SOURCE_FNAMES
+        ]
+
+        # not a docx document at all
+        self.broken_file_name = os.path.join(self.dest_dir, 'broken.docx')
+        with open(self.broken_file_name, 'wb') as f:
+            f.write(b'definitely not a zip archive')
+
+    def tearDown(self):
+        shutil.rmtree(self.dest_dir)
+
+
+class ParseFilesTest(ParseTestCase):
+    """parse_files() tests"""
+
+    def test_parse_files_with_workers(self):
+        """Files are parsed by worker processes"""
+        outcomes = parse_files(self.file_names, self.dest_dir, workers=2)
+
+        self.assertEqual(
+            sorted(x['file_name'] for x in outcomes),
+            sorted(self.file_names)
+        )
+        self.assertTrue(all(x['ok'] for x in outcomes))
+        self.assertEqual(
+            sorted(x for x in os.listdir(self.dest_dir)
+                   if x.endswith('.json')),
+            ['Бессарабов Даниил Владимирович.json',
+             'Чук Владимир Владимирович.json']
+        )
+
+    def test_outcomes_are_stored_while_queueing(self):
+        """Done files are stored before all files are queued"""
+        stored = []
+        file_names = self.file_names * (PENDING_FILES_PER_WORKER + 1)
+
+        def iter_file_names():
+            for idx, file_name in enumerate(file_names):
+                if idx == len(file_names) - 1:
+                    # interruption while the last file is discovered
+                    self.assertTrue(stored)
+                    raise KeyboardInterrupt
+                yield file_name
+
+        with self.assertRaises(KeyboardInterrupt):
+            parse_files(iter_file_names(), self.dest_dir, workers=2,
+                        on_outcome=stored.append)
+        self.assertTrue(all(x['ok'] for x in stored))
+
+    def test_outcomes_are_stored_when_file_names_fail(self):
+        """Files queued before iteration error are stored"""
+        stored = []
+
+        def iter_file_names():
+            yield from self.file_names
+            raise PermissionError('Permission denied')
+
+        with self.assertRaises(PermissionError):
+            parse_files(iter_file_names(), self.dest_dir, workers=2,
+                        on_outcome=stored.append)
+        self.assertEqual(
+            sorted(x['file_name'] for x in stored), sorted(self.file_names)
+        )
+
+    def test_parse_files_isolates_errors(self):
+        """Broken file doesn't affect parsing of other files"""
+        for workers in [1, 2]:
+            with self.subTest(workers=workers):
+                outcomes = parse_files(
+                    [self.broken_file_name] + self.file_names,
+                    self.dest_dir,
+                    workers=workers
+                )
+                failed = [x['file_name'] for x in outcomes if not x['ok']]
+                self.assertEqual(failed, [self.broken_file_name])
+                self.assertEqual(len(outcomes), 3)
+
+    def test_document_without_fio_fails(self):
+        """Results aren't saved without recognized 'fio'"""
+        file_name = make_docx(
+            os.path.join(self.dest_dir, 'no_fio.docx'), fio='Без имени'
+        )
+        for export in [False, True]:
+            with self.subTest(export=export):
+                outcome = parse_file(file_name, self.dest_dir, export=export)
+                self.assertFalse(outcome['ok'])
+                self.assertIn("'fio' isn't recognized", outcome['error'])
+                self.assertNotIn('exported', outcome)
+        self.assertEqual(
+            sorted(x for _, _, names in os.walk(self.dest_dir)
+                   for x in names),
+            ['broken.docx', 'no_fio.docx']
+        )
+
+    def test_parse_files_with_profile(self):
+        """Paragraphs loading is profiled with per paragraph costs"""
+        import pstats
+
+        from profiling import dump_profile
+
+        for workers in [1, 2]:
+            with self.subTest(workers=workers):
+                outcomes = parse_files(
+                    self.file_names, self.dest_dir, workers=workers,
+                    profile=True
+                )
+                profile_name = os.path.join(self.dest_dir, 'parse.pstats')
+                report = dump_profile(outcomes, profile_name, top=3)
+
+                self.assertEqual(len(report['files']), 2)
+                self.assertEqual(len(report['paragraphs']), 3)
+                paragraph = report['paragraphs'][0]
+                self.assertIn(paragraph['file_name'], self.file_names)
+                self.assertGreater(paragraph['runs'], 0)
+                self.assertGreater(paragraph['length'], 0)
+                self.assertGreater(paragraph['classify_seconds'], 0)
+                self.assertTrue(os.path.isfile(
+                    os.path.join(self.dest_dir, 'parse.json')
+                ))
+                stats = pstats.Stats(profile_name)
+                self.assertTrue(any(
+                    x[2] == 'load_paragraphs' for x in stats.stats
+                ))
+
+
+class RunPipelineTest(ParseTestCase):
+    """run_pipeline() tests"""
+
+    def test_pipeline_results_equal_to_parse_files(self):
+        """Pipeline saves the same results as parse_files() does"""
+        pipeline_dir = os.path.join(self.dest_dir, 'pipeline')
+        outcomes = run_pipeline(
+            [self.broken_file_name] + self.file_names,
+            pipeline_dir,
+            read_concurrency=2,
+            parse_concurrency=2,
+            write_concurrency=2
+        )
+        parse_files(self.file_names, self.dest_dir)
+
+        failed = [x['file_name'] for x in outcomes if not x['ok']]
+        self.assertEqual(failed, [self.broken_file_name])
+
+        saved = [x for x in outcomes if x['ok']]
+        self.assertEqual(len(saved), 2)
+        for outcome in saved:
+            for output in outcome['outputs']:
+                with open(output, 'rb') as f:
+                    data = f.read()
+                path = os.path.relpath(output, pipeline_dir)
+                with open(os.path.join(self.dest_dir, path), 'rb') as f:
+                    self.assertEqual(data, f.read())
+
+
+class AggregateOutputTest(ParseTestCase):
+    """AggregateOutput tests"""
+
+    def test_jsonl_results_equal_to_json_files(self):
+        """Every document results are written as one JSON Lines record"""
+        aggregate_dir = os.path.join(self.dest_dir, 'aggregate')
+        with AggregateOutput(aggregate_dir, compression='gzip') as sink:
+            outcomes = parse_files(
+                [self.broken_file_name] + self.file_names,
+                aggregate_dir,
+                sink=sink
+            )
+        parse_files(self.file_names, self.dest_dir)
+
+        self.assertEqual(
+            sorted(os.listdir(aggregate_dir)),
+            ['images.zip', 'results.jsonl.gz']
+        )
+        self.assertEqual(len([x for x in outcomes if x['ok']]), 2)
+
+        with gzip.open(sink.results_file_name, 'rt', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 2)
+        for record in records:
+            file_name = os.path.join(
+                self.dest_dir, '{}.json'.format(record['fio'])
+            )
+            with open(file_name, 'r', encoding='utf-8') as f:
+                self.assertEqual(record, json.load(f))
+
+        with ZipFile(sink.images_file_name) as archive:
+            for name in archive.namelist():
+                with open(os.path.join(self.dest_dir, name), 'rb') as f:
+                    self.assertEqual(archive.read(name), f.read())
+            self.assertEqual(len(archive.namelist()), 2)
+
+    def test_append_after_unclean_stop_is_rejected(self):
+        """Files which weren't closed by the previous run aren't appended"""
+        aggregate_dir = os.path.join(self.dest_dir, 'aggregate')
+        with AggregateOutput(aggregate_dir, compression='gzip') as sink:
+            parse_files(self.file_names[:1], aggregate_dir, sink=sink)
+
+        # killed run leaves files open
+        killed = AggregateOutput(aggregate_dir, compression='gzip')
+        killed.open(append=True)
+        parse_files(self.file_names[1:], aggregate_dir, sink=killed)
+
+        with self.assertRaises(ValueError):
+            AggregateOutput(aggregate_dir, compression='gzip').open(
+                append=True
+            )
+
+        # files closed cleanly are appended
+        killed.close()
+        sink = AggregateOutput(aggregate_dir, compression='gzip')
+        sink.open(append=True)
+        sink.close()
+
+        with gzip.open(sink.results_file_name, 'rt', encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual(
+            sorted(os.listdir(aggregate_dir)),
+            ['images.zip', 'results.jsonl.gz']
+        )
+
+
+class FilterFilenamesTest(unittest.TestCase):
+    """filter_filenames() and is_filename_fit() tests"""
+
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        for file_name in ['top.docx', 'Вопросы депутату.docx',
+                          os.path.join('a', 'b', 'card.docx'),
+                          os.path.join('a', 'notes.txt'),
+                          os.path.join('c', '~$lock.docx'),
+                          os.path.join('c', 'card ВЫБЫЛ.docx'),
+                          os.path.join('УМЕР', 'card.docx')]:
+            file_name = os.path.join(self.source_dir, file_name)
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            open(file_name, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.source_dir)
+
+    def test_filter_filenames(self):
+        """Only fit docx files are found by one or many workers"""
+        for workers in [1, 3]:
+            with self.subTest(workers=workers):
+                self.assertEqual(
+                    sorted(os.path.relpath(x, self.source_dir)
+                           for x in filter_filenames(
+                               self.source_dir, is_filename_fit,
+                               workers=workers)),
+                    [os.path.join('a', 'b', 'card.docx'), 'top.docx',
+                     os.path.join('УМЕР', 'card.docx')]
+                )
+
+    def test_predicate_gets_only_docx_files(self):
+        """Files are filtered by extension before the predicate"""
+        checked = []
+        list(filter_filenames(self.source_dir, checked.append))
+        self.assertFalse([x for x in checked if not x.endswith('.docx')])
+
+        self.assertEqual(len(list(filter_filenames(
+            self.source_dir, lambda x: True, extensions=()
+        ))), 7)
+
+    def test_is_filename_fit_checks_base_name(self):
+        """Absolute file names are checked by base name"""
+        self.assertFalse(is_filename_fit('/in/~$card.docx'))
+        self.assertFalse(is_filename_fit('/in/Вопросы депутату.docx'))
+        self.assertFalse(is_filename_fit('/in/card ВЫБЫЛА.docx'))
+        self.assertTrue(is_filename_fit('/in/УМЕР/card.docx'))
+
+
+class StartupTest(unittest.TestCase):
+    """CLI startup tests"""
+
+    def _run_python(self, *args):
+        return subprocess.run(
+            [sys.executable] + list(args),
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        )
+
+    def test_heavy_modules_are_not_imported(self):
+        """Importing parse.py doesn't import heavy modules"""
+        res = self._run_python('-c', (
+            'import sys, parse; '
+            'print(" ".join(x.split(".")[0] for x in sys.modules))'
+        ))
+        imported = set(res.stdout.split())
+        self.assertEqual(
+            [x for x in LAZY_MODULES if x in imported], []
+        )
+
+    def test_import_time_budget(self):
+        """Import time of parse.py stays within the budget"""
+        cumulative = []
+        for _ in range(IMPORT_TIME_REPEAT):
+            res = self._run_python('-X', 'importtime', '-c', 'import parse')
+            cumulative.extend(
+                int(line.split('|')[1])
+                for line in res.stderr.splitlines()
+                if line.startswith('import time:') and
+                line.split('|')[2].strip() == 'parse'
+            )
+        self.assertEqual(len(cumulative), IMPORT_TIME_REPEAT)
+        self.assertLess(min(cumulative), IMPORT_TIME_BUDGET)
+
+
+class ParseCacheTest(unittest.TestCase):
+    """ParseCache tests"""
+
+    def setUp(self):
+        self.dest_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.dest_dir, SOURCE_FNAMES[0])
+        shutil.copy(os.path.join(SOURCE_DIR, SOURCE_FNAMES[0]),
+                    self.file_name)
+
+        outcome = parse_files([self.file_name], self.dest_dir)[0]
+        self.outputs = outcome['outputs']
+
+        cache = ParseCache(self.dest_dir, version='1')
+        cache.update(self.file_name, self.outputs)
+        cache.save()
+
+    def tearDown(self):
+        shutil.rmtree(self.dest_dir)
+
+    def _load_cache(self, version='1'):
+        cache = ParseCache(self.dest_dir, version=version)
+        cache.load()
+        return cache
+
+    def test_unchanged_file_is_valid(self):
+        """Unchanged file with existing outputs is taken from cache"""
+        self.assertEqual(len(self.outputs), 2)
+        self.assertTrue(self._load_cache().is_valid(self.file_name))
+
+    def test_touched_file_with_same_content_is_valid(self):
+        """File with changed mtime but the same content is still valid"""
+        os.utime(self.file_name, ns=(0, 0))
+        self.assertTrue(self._load_cache().is_valid(self.file_name))
+
+    def test_changed_file_is_invalid(self):
+        """File with changed content is parsed again"""
+        with open(self.file_name, 'ab') as f:
+            f.write(b'\0')
+        self.assertFalse(self._load_cache().is_valid(self.file_name))
+
+    def test_new_version_invalidates_cache(self):
+        """Parser or config version change invalidates all entries"""
+        self.assertFalse(
+            self._load_cache(version='2').is_valid(self.file_name)
+        )
+
+    def test_removed_output_invalidates_cache(self):
+        """File is parsed again if any of its outputs is missing"""
+        os.remove(self.outputs[-1])
+        self.assertFalse(self._load_cache().is_valid(self.file_name))
+
+
+class ParseJournalTest(ParseTestCase):
+    """ParseJournal tests"""
+
+    def _run(self, file_names, resume=False):
+        journal = ParseJournal(self.dest_dir)
+        if resume:
+            journal.load()
+            file_names = journal.filter_done(file_names)
+        journal.open(append=resume)
+        with journal:
+            return parse_files(
+                file_names, self.dest_dir, on_outcome=journal.record
+            )
+
+    def test_partial_line_is_removed(self):
+        """Line cut by the crash is removed when journal is appended"""
+        journal_path = ParseJournal(self.dest_dir).journal_path
+        for content in ['', '{"a": 1}\n', '{"a": 1}\n{"b"', '{"b"']:
+            with self.subTest(content=content):
+                with open(journal_path, 'w') as f:
+                    f.write(content)
+                with ParseJournal(self.dest_dir) as journal:
+                    journal.open(append=True)
+                with open(journal_path) as f:
+                    self.assertEqual(
+                        f.read(), content[:content.rfind('\n') + 1]
+                    )
+
+    def test_outcomes_are_journaled(self):
+        """Every outcome is written to the journal when file is done"""
+        self._run([self.broken_file_name] + self.file_names)
+
+        journal = ParseJournal(self.dest_dir)
+        journal.load()
+        self.assertFalse(journal.is_done(self.broken_file_name))
+        for file_name in self.file_names:
+            self.assertTrue(journal.is_done(file_name))
+
+    def test_resume_skips_done_files(self):
+        """Resumed run parses only files not done by the previous run"""
+        self._run(self.file_names[:1])
+
+        # interrupted write of the last line
+        with open(ParseJournal(self.dest_dir).journal_path, 'a') as f:
+            f.write('{"file_name": "')
+
+        outcomes = self._run(
+            self.file_names + [self.broken_file_name], resume=True
+        )
+        self.assertEqual(
+            [x['file_name'] for x in outcomes],
+            self.file_names[1:] + [self.broken_file_name]
+        )
+
+        # the first line after the cut one is kept
+        with open(ParseJournal(self.dest_dir).journal_path) as f:
+            self.assertEqual(
+                [json.loads(x)['file_name'] for x in f],
+                self.file_names + [self.broken_file_name]
+            )
+
+        outcomes = self._run(self.file_names, resume=True)
+        self.assertEqual(outcomes, [])
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from http.client import HTTPConnection
+from urllib.parse import quote
+
+from asozd import ASOZDParser
+from server import ParseServer
+
+logger = logging.getLogger(__name__)
+
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+SOURCE_DIR = os.path.join(BASE_DIR, 'test')
+SOURCE_FNAME1 = 'source_n1.docx'
+
+
+class ParseServerTest(unittest.TestCase):
+    """ParseServer tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.file_name = os.path.join(SOURCE_DIR, SOURCE_FNAME1)
+        with ASOZDParser(cls.file_name) as P:
+            P.load_paragraphs()
+            cls.expected = P.get_results_for_save()
+
+        cls.server = ParseServer(('127.0.0.1', 0), workers=1, queue_size=1)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.thread.join()
+        cls.server.server_close()
+
+    def _request(self, method, url, body=None):
+        conn = HTTPConnection(*self.server.server_address)
+        try:
+            conn.request(method, url, body=body)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    def test_parse_uploaded_content(self):
+        """Uploaded docx content is parsed"""
+        with open(self.file_name, 'rb') as f:
+            status, data = self._request('POST', '/parse', f.read())
+        self.assertEqual(status, 200)
+        self.assertEqual(data, self.expected)
+
+    def test_parse_file_path(self):
+        """Server side docx file is parsed"""
+        status, data = self._request(
+            'POST', '/parse?path={}'.format(quote(self.file_name))
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(data, self.expected)
+
+    def test_errors(self):
+        """Bad requests and parsing errors are reported as json"""
+        for url, body, expected_status in [
+                ('/parse', b'not a docx', 422),
+                ('/parse', None, 400),
+                ('/parse?path=/not/existing.docx', None, 404),
+                ('/unknown', b'', 404)]:
+            with self.subTest(url=url, body=body):
+                status, data = self._request('POST', url, body)
+                self.assertEqual(status, expected_status)
+                self.assertIn('error', data)
+
+    def test_busy_server_rejects_requests(self):
+        """Requests over the queue capacity get 503 status"""
+        for _ in range(2):
+            self.assertTrue(self.server.acquire())
+        try:
+            status, data = self._request(
+                'POST', '/parse?path={}'.format(quote(self.file_name))
+            )
+            self.assertEqual(status, 503)
+        finally:
+            for _ in range(2):
+                self.server.release()
+
+        status, data = self._request('GET', '/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(data['active'], 0)
+
+    def test_pool_is_restarted_when_worker_dies(self):
+        """Died worker fails only the request being parsed"""
+        with self.assertRaises(BrokenProcessPool):
+            self.server.executor.submit(os._exit, 1).result()
+
+        status, data = self._request(
+            'POST', '/parse?path={}'.format(quote(self.file_name))
+        )
+        self.assertEqual(status, 503)
+        self.assertIn('error', data)
+
+        status, data = self._request(
+            'POST', '/parse?path={}'.format(quote(self.file_name))
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(data, self.expected)
+
+    def test_clize_is_not_imported(self):
+        """Importing server doesn't import CLI dependencies"""
+        self.assertNotIn('clize', subprocess.run(
+            [sys.executable, '-c',
+             'import server, sys; print(sorted(sys.modules))'],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from zipfile import ZipFile
+
+import shared_results
+from output import AggregateOutput
+from parse import parse_files
+from pipeline import run_pipeline
+from shared_results import (SharedPayload, attach_exported, share_exported,
+                            start_channel)
+
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+SOURCE_DIR = os.path.join(BASE_DIR, 'test')
+SOURCE_FNAMES = ['source_n1.docx', 'source_n2.docx']
+
+
+@unittest.skipUnless(start_channel(), 'Shared memory is not supported')
+class SharedResultsTest(unittest.TestCase):
+    """share_exported() and attach_exported() tests"""
+
+    def test_large_images_are_shared(self):
+        """Only images over the threshold are passed as descriptors"""
+        exported = {
+            'json_file_name': 'a.json',
+            'results': {'fio': 'a'},
+            'images': [('images/a.png', b'a' * 10),
+                       ('images/b.png', b'b' * 1000)],
+        }
+        shared = share_exported(exported, threshold=100)
+
+        self.assertEqual(shared['images'][0], exported['images'][0])
+        self.assertIsInstance(shared['images'][1][1], SharedPayload)
+
+        with attach_exported(shared) as attached:
+            self.assertEqual(
+                [(x, bytes(y)) for x, y in attached['images']],
+                exported['images']
+            )
+            self.assertEqual(attached['results'], exported['results'])
+
+        # segment is removed after the results are written
+        with self.assertRaises(FileNotFoundError):
+            with attach_exported(shared):
+                pass
+
+    def test_exported_without_shared_images(self):
+        """Results without descriptors are returned as is"""
+        exported = {'images': [('images/a.png', b'a')]}
+        with attach_exported(exported) as attached:
+            self.assertIs(attached, exported)
+
+
+@unittest.skipUnless(start_channel(), 'Shared memory is not supported')
+class SharedResultsParseTest(unittest.TestCase):
+    """Parsing with images passed through shared memory"""
+
+    def setUp(self):
+        self.dest_dir = tempfile.mkdtemp()
+        self.file_names = [
+            os.path.join(SOURCE_DIR, x) for x in SOURCE_FNAMES
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.dest_dir)
+
+    def _get_images(self, run, **kwargs):
+        dest_dir = os.path.join(self.dest_dir, run.__name__)
+        with AggregateOutput(dest_dir) as sink:
+            outcomes = run(self.file_names, dest_dir, sink=sink, **kwargs)
+        self.assertTrue(all(x['ok'] for x in outcomes))
+
+        with ZipFile(sink.images_file_name) as images:
+            return {x: images.read(x) for x in images.namelist()}
+
+    def test_images_are_equal_to_pickled_ones(self):
+        """Images passed through shared memory are written unchanged"""
+        expected = self._get_images(parse_files, workers=2,
+                                    shared_memory=False)
+        self.assertEqual(len(expected), 2)
+
+        with mock.patch.object(shared_results, 'SHARED_MEMORY_THRESHOLD', 1):
+            self.assertEqual(self._get_images(parse_files, workers=2),
+                             expected)
+            self.assertEqual(self._get_images(run_pipeline), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from parse import parse_files
+from pipeline import run_pipeline
+from validate import (ValidationRules, get_image_names, validate_dir,
+                      validate_results)
+
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+SOURCE_DIR = os.path.join(BASE_DIR, 'test')
+SOURCE_FNAMES = ['source_n1.docx', 'source_n2.docx']
+
+
+class ValidateResultsTest(unittest.TestCase):
+    """validate_results() tests"""
+
+    def test_rules(self):
+        """Every rule reports its issue"""
+        results = {'lobby': ['a', 'b', 'c'], 'family': ' ', 'photo': []}
+        rules = ValidationRules(
+            max_lobby_count=2, required_sections=('family', 'bio')
+        )
+
+        self.assertEqual(
+            [x['rule'] for x in validate_results(results, rules)],
+            ['max_lobby_count', 'required_sections', 'required_sections',
+             'check_image']
+        )
+        self.assertEqual(validate_results(results, rules)[0]['count'], 3)
+        self.assertEqual(validate_results(results, ValidationRules(
+            max_lobby_count=None, check_image=False
+        )), [])
+        self.assertEqual(
+            validate_results({'photo': ['images/a.png']}, rules)[-1],
+            {'rule': 'required_sections', 'message': "Section 'bio' is empty"}
+        )
+
+
+class ValidateDirTest(unittest.TestCase):
+    """validate_dir() tests"""
+
+    def setUp(self):
+        self.dest_dir = tempfile.mkdtemp()
+        parse_files(
+            [os.path.join(SOURCE_DIR, x) for x in SOURCE_FNAMES],
+            self.dest_dir
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.dest_dir)
+
+    def test_valid_results(self):
+        """Parsed fixtures pass default rules"""
+        for workers in [1, 2]:
+            with self.subTest(workers=workers):
+                report = validate_dir(
+                    self.dest_dir, workers=workers, chunk_size=1
+                )
+                self.assertEqual(report['checked'], 2)
+                self.assertEqual(report['failed'], 0)
+                self.assertEqual(report['issues'], {})
+
+    def test_issues_are_reported(self):
+        """Missed images and broken json files are reported"""
+        images_dir = os.path.join(self.dest_dir, 'images')
+        removed = sorted(os.listdir(images_dir))[0]
+        os.remove(os.path.join(images_dir, removed))
+        with open(os.path.join(self.dest_dir, 'broken.json'), 'w') as f:
+            f.write('{')
+        # service files are skipped
+        with open(os.path.join(self.dest_dir, '.manifest.json'), 'w') as f:
+            f.write('[]')
+
+        report = validate_dir(self.dest_dir, workers=2, chunk_size=1)
+
+        self.assertEqual(report['checked'], 3)
+        self.assertEqual(report['failed'], 2)
+        self.assertEqual(
+            report['issues']['broken.json'][0]['rule'], 'valid_json'
+        )
+        self.assertEqual(
+            report['issues'][os.path.splitext(removed)[0] + '.json'],
+            [{'rule': 'check_image', 'message': "Couldn't find image"}]
+        )
+        json.dumps(report)
+
+    def test_image_extensions(self):
+        """Images with other extensions are ignored if passed"""
+        images_dir = os.path.join(self.dest_dir, 'images')
+        rules = ValidationRules(image_extensions=('.gif',))
+
+        self.assertEqual(get_image_names(images_dir, rules), set())
+        self.assertEqual(len(get_image_names(images_dir)), 2)
+        self.assertEqual(validate_dir(self.dest_dir, rules)['failed'], 2)
+
+
+class InlineValidationTest(unittest.TestCase):
+    """Validation of results right after parsing"""
+
+    def setUp(self):
+        self.dest_dir = tempfile.mkdtemp()
+        self.file_names = [
+            os.path.join(SOURCE_DIR, x) for x in SOURCE_FNAMES
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.dest_dir)
+
+    def test_issues_are_returned_with_outcomes(self):
+        """parse_files() and run_pipeline() return found issues"""
+        rules = ValidationRules(required_sections=('family',))
+        for run in [parse_files, run_pipeline]:
+            with self.subTest(run=run.__name__):
+                outcomes = run(
+                    self.file_names, self.dest_dir, validation_rules=rules
+                )
+                self.assertEqual(
+                    [x['issues'] for x in outcomes],
+                    [[{'rule': 'required_sections',
+                       'message': "Section 'family' is empty"}]] * 2
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
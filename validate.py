@@ -0,0 +1,243 @@
+"""
+Validation of parsing results.
+
+Json results within destination directory are checked in parallel
+against configurable rules (ValidationRules):
+  * max_lobby_count - max number of lobby items
+  * required_sections - sections which must have non empty values
+  * check_image - image named as json file has to exist
+
+Images are found with one listing of images directory. The same
+rules could be applied to results right after parsing (see
+validate_results). Report is written as json.
+"""
+import json
+import logging
+import os
+from typing import NamedTuple, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+OUT_DIR = r'out'
+IMAGES_OUT_DIR = r'images'
+
+# sections checked by the rules
+LOBBY_SECTION = 'lobby'
+IMAGE_SECTION = 'photo'
+
+
+class ValidationRules(NamedTuple):
+    """Rules applied to the results of one document"""
+    max_lobby_count: Optional[int] = 3
+    required_sections: Tuple[str, ...] = ()
+    check_image: bool = True
+    # image file extensions taken into account, any if empty
+    image_extensions: Tuple[str, ...] = ()
+
+
+DEFAULT_RULES = ValidationRules()
+
+
+def _issue(rule, message, **details):
+    return dict(details, rule=rule, message=message)
+
+
+def validate_results(results: dict,
+                     rules: ValidationRules = DEFAULT_RULES,
+                     has_image: bool = None) -> list:
+    """
+    Returns list of issues of the document results.
+
+    `results` is a dict saved as json (see
+    ASOZDParser.get_results_for_save), `has_image` tells if the
+    image of the document is saved. If `has_image` is None image
+    is looked for within the results.
+    """
+    issues = []
+
+    lobby = results.get(LOBBY_SECTION) or []
+    if rules.max_lobby_count is not None and \
+            len(lobby) > rules.max_lobby_count:
+        issues.append(_issue(
+            'max_lobby_count',
+            'Lobby items count {} is greater than {}'.format(
+                len(lobby), rules.max_lobby_count
+            ),
+            count=len(lobby)
+        ))
+
+    for section in rules.required_sections:
+        value = results.get(section)
+        if not value or (isinstance(value, str) and not value.strip()):
+            issues.append(_issue(
+                'required_sections',
+                "Section '{}' is empty".format(section)
+            ))
+
+    if has_image is None:
+        has_image = bool(results.get(IMAGE_SECTION))
+    if rules.check_image and not has_image:
+        issues.append(_issue('check_image', "Couldn't find image"))
+
+    return issues
+
+
+def get_image_names(images_dir: str,
+                    rules: ValidationRules = DEFAULT_RULES) -> set:
+    """Returns names (without extension) of images in the directory"""
+    names = set()
+    try:
+        with os.scandir(images_dir) as entries:
+            for entry in entries:
+                name, ext = os.path.splitext(entry.name)
+                if rules.image_extensions and \
+                        ext.lower() not in rules.image_extensions:
+                    continue
+                if entry.is_file():
+                    names.add(name)
+    except FileNotFoundError:
+        pass
+    return names
+
+
+def validate_file(file_name: str,
+                  rules: ValidationRules = DEFAULT_RULES,
+                  image_names: frozenset = frozenset()) -> list:
+    """Returns list of issues of the json results file"""
+    try:
+        with open(file_name, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    except (OSError, ValueError) as e:
+        return [_issue('valid_json', "Couldn't load results: {}".format(e))]
+    if not isinstance(results, dict):
+        return [_issue('valid_json', 'Results are not a json object')]
+
+    name = os.path.splitext(os.path.basename(file_name))[0]
+    return validate_results(results, rules, name in image_names)
+
+
+def _validate_files(file_names, rules, image_names):
+    return [validate_file(x, rules, image_names) for x in file_names]
+
+
+def validate_dir(results_dir: str,
+                 rules: ValidationRules = DEFAULT_RULES,
+                 workers: int = None,
+                 chunk_size: int = 64) -> dict:
+    """
+    Validates all json results within the directory.
+
+    Files are checked by chunks in `workers` processes
+    (number of CPUs by default). Returns report dict.
+    """
+    with os.scandir(results_dir) as entries:
+        file_names = sorted(
+            entry.path for entry in entries
+            # hidden files are service ones (cache manifest, etc.)
+            if entry.name.endswith('.json') and
+            not entry.name.startswith('.') and entry.is_file()
+        )
+
+    image_names = frozenset()
+    if rules.check_image:
+        image_names = frozenset(get_image_names(
+            os.path.join(results_dir, IMAGES_OUT_DIR), rules
+        ))
+
+    chunks = [file_names[i:i + chunk_size]
+              for i in range(0, len(file_names), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(chunks) <= 1:
+        results = [_validate_files(x, rules, image_names) for x in chunks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                _validate_files, chunks,
+                [rules] * len(chunks), [image_names] * len(chunks)
+            ))
+
+    issues = {}
+    for chunk, chunk_issues in zip(chunks, results):
+        for file_name, file_issues in zip(chunk, chunk_issues):
+            if file_issues:
+                issues[os.path.basename(file_name)] = file_issues
+
+    return make_report(results_dir, len(file_names), issues)
+
+
+def make_report(results_dir: str, checked: int, issues: dict) -> dict:
+    """Returns report dict for issues of files: file name -> issues"""
+    return {
+        'results_dir': os.path.abspath(results_dir),
+        'checked': checked,
+        'failed': len(issues),
+        'issues': issues,
+    }
+
+
+def dump_report(report: dict, file_name: str = None) -> None:
+    """Writes json report to `file_name` or stdout"""
+    content = json.dumps(report, ensure_ascii=False, indent=2)
+    if file_name:
+        with open(file_name, 'w', encoding='utf-8') as f:
+            f.write(content)
+        logger.info('Validation report saved to %s', file_name)
+    else:
+        print(content)
+
+
+def validate(results_dir: str = None,
+             *,
+             max_lobby_count: int = 3,
+             required_sections: str = '',
+             no_image_check: bool = False,
+             image_extensions: str = '',
+             workers: int = None,
+             report: str = None) -> None:
+    """
+    Validate parsing results within the destination directory.
+
+    Exits with status 1 if any issue is found.
+
+    :param results_dir: Directory with json results ('out' by default)
+    :param max_lobby_count: Max number of lobby items (0 to skip check)
+    :param required_sections: Comma separated sections which must
+                              have non empty values
+    :param no_image_check: Don't check that image of the document exists
+    :param image_extensions: Comma separated image extensions
+                             (like '.png,.jpg'), any if not passed
+    :param workers: Number of worker processes (number of CPUs by default)
+    :param report: File name for json report (stdout by default)
+    """
+    rules = ValidationRules(
+        max_lobby_count=max_lobby_count or None,
+        required_sections=tuple(
+            x.strip() for x in required_sections.split(',') if x.strip()
+        ),
+        check_image=not no_image_check,
+        image_extensions=tuple(
+            x.strip().lower() for x in image_extensions.split(',')
+            if x.strip()
+        )
+    )
+    res = validate_dir(
+        results_dir or os.path.join(BASE_DIR, OUT_DIR), rules, workers
+    )
+
+    dump_report(res, report)
+
+    if res['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    from clize import run
+
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.INFO)
+    run(validate)